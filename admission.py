@@ -0,0 +1,168 @@
+"""Admission control and load shedding for the /ask API.
+
+Two layers protect the server during traffic bursts:
+
+- per-client token buckets reject clients that exceed their rate (429);
+- a bounded in-flight limit on LLM calls with a short wait queue rejects
+  work once the queue is full or its deadline passes (503).
+
+Only requests that actually need the LLM enter the in-flight gate, so cache
+hits and extractive fast-path answers are never queued behind slow LLM calls.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Rejected(Exception):
+    """Request shed by admission control; map to an HTTP error with Retry-After."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(f"{reason} (retry after {retry_after:.1f}s)")
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def try_acquire(self, now: float) -> float:
+        """Take one token; return 0 on success, else seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-client rate limiting plus a bounded, deadline-limited LLM queue."""
+
+    def __init__(
+        self,
+        rate_per_client: float = 1.0,
+        burst: int = 5,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 2.0,
+        max_clients: int = 10000,
+    ):
+        """
+        Args:
+            rate_per_client: Sustained requests per second allowed per client.
+            burst: Requests a client may send at once before being limited.
+            max_in_flight: Concurrent LLM calls allowed.
+            max_queue: Requests allowed to wait for an LLM slot.
+            queue_timeout: Longest a request may wait for a slot, in seconds.
+            max_clients: Buckets kept; least recently seen clients are evicted.
+        """
+        self.rate_per_client = rate_per_client
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._buckets_lock = threading.Lock()
+
+        self._slots = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+
+        # Each counter group is guarded by the lock of the layer that updates it
+        self._rate_counters = {"admitted": 0, "shed_rate_limited": 0}
+        self._queue_counters = {"llm_calls": 0, "shed_queue_full": 0, "shed_queue_timeout": 0}
+        self._max_queue_depth = 0
+
+    def admit(self, client_id: str):
+        """Charge one request to the client's bucket.
+
+        Raises:
+            Rejected: 429 when the client is over its rate.
+        """
+        now = time.monotonic()
+        with self._buckets_lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_client, self.burst, now)
+                self._buckets[client_id] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_id)
+            wait = bucket.try_acquire(now)
+
+            if wait > 0:
+                self._rate_counters["shed_rate_limited"] += 1
+                raise Rejected(429, "rate limit exceeded", wait)
+            self._rate_counters["admitted"] += 1
+
+    @contextmanager
+    def llm_slot(self):
+        """Hold one of the in-flight LLM slots for the duration of the block.
+
+        Raises:
+            Rejected: 503 when the wait queue is full or the wait times out.
+        """
+        with self._slots:
+            if self._in_flight >= self.max_in_flight or self._waiting:
+                if self._waiting >= self.max_queue:
+                    self._queue_counters["shed_queue_full"] += 1
+                    raise Rejected(503, "server overloaded", self.queue_timeout)
+
+                self._waiting += 1
+                self._max_queue_depth = max(self._max_queue_depth, self._waiting)
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self._in_flight >= self.max_in_flight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._queue_counters["shed_queue_timeout"] += 1
+                            raise Rejected(503, "queue deadline exceeded", self.queue_timeout)
+                        self._slots.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._in_flight += 1
+            self._queue_counters["llm_calls"] += 1
+
+        try:
+            yield
+        finally:
+            with self._slots:
+                self._in_flight -= 1
+                self._slots.notify()
+
+    def metrics(self) -> Dict:
+        with self._slots:
+            metrics = {
+                "in_flight": self._in_flight,
+                "queue_depth": self._waiting,
+                "max_queue_depth": self._max_queue_depth,
+                **self._queue_counters,
+            }
+        with self._buckets_lock:
+            metrics["tracked_clients"] = len(self._buckets)
+            metrics.update(self._rate_counters)
+        metrics["shed_total"] = (
+            metrics["shed_rate_limited"] + metrics["shed_queue_full"] + metrics["shed_queue_timeout"]
+        )
+        return metrics
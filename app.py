@@ -32,27 +32,178 @@ if not os.path.exists(file_path):
     gdown.download(url, file_path, quiet=False)
 
 
+import hmac
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from college_rag import CollegeRAGSystem
+from admission import AdmissionController, Rejected
+from faq_cache import FAQCache, FAQWarmer, QueryLog
+from index_snapshot import SnapshotWatcher
+from ingest import IngestionQueue, SUPPORTED_EXTENSIONS, remove_upload, save_upload_info, upload_path
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
 CORS(app)  # Allow frontend to connect
 
+# Behind N reverse proxies, take the client address from the last N X-Forwarded-For
+# entries. Left at 0 the header is ignored, since any caller could set it.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
 # Initialize RAG system
-GROQ_API_KEY = "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"
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "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")
+RAG_INDEX_FILE = os.getenv("RAG_INDEX_FILE", "college_rag_complete.pkl")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 print("Loading RAG system...")
-rag = CollegeRAGSystem(GROQ_API_KEY)
-rag.load("college_rag_complete.pkl")
+# USE_SHARDS=1 searches only the routed document-family shards. Leave it off until
+# evaluate_retrieval.py --index-types flat routed shows recall vs flat close to 1
+# with the production embedding model.
+rag = CollegeRAGSystem(
+    GROQ_API_KEY,
+    use_shards=os.getenv("USE_SHARDS") == "1",
+    chunk_store=os.getenv("CHUNK_STORE") == "1",
+    columnar_metadata=os.getenv("COLUMNAR_METADATA") == "1",
+)
+rag.load(RAG_INDEX_FILE)
 print(f"✓ RAG system loaded! Documents: {len(rag.documents)}")
 
+# Admission control: per-client rate limits and a bounded queue for LLM calls
+admission = AdmissionController(
+    rate_per_client=float(os.getenv("RATE_PER_CLIENT", "1.0")),
+    burst=int(os.getenv("RATE_BURST", "5")),
+    max_in_flight=int(os.getenv("MAX_LLM_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("MAX_LLM_QUEUE", "32")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "2.0")),
+)
+rag.llm_gate = admission.llm_slot
+
+# Precomputed FAQ answers; rebuilt in the background if the index changed
+FAQ_CACHE_FILE = os.getenv("FAQ_CACHE_FILE", "faq_cache.pkl")
+QUERY_LOG_FILE = os.getenv("QUERY_LOG_FILE", "query_log.jsonl")
+# Written off the request thread and rotated to <file>.1 past QUERY_LOG_MAX_MB
+query_log = QueryLog(QUERY_LOG_FILE, max_bytes=int(float(os.getenv("QUERY_LOG_MAX_MB", "5")) * 1024 * 1024))
+faq_warmer = FAQWarmer(rag, FAQ_CACHE_FILE, log_path=QUERY_LOG_FILE,
+                       delay=float(os.getenv("FAQ_WARM_DELAY", "2.0")))
+rag.faq_cache = FAQCache.load(FAQ_CACHE_FILE, rag.index_version)
+if rag.faq_cache is None:
+    faq_warmer.request()
+
+
+def refresh_faq_cache(snapshot):
+    """After a hot swap, use the matching FAQ cache or rebuild it in the background
+
+    After an append, answers the new chunks cannot change keep being served
+    while the warmer rebuilds the rest.
+    """
+    cache = FAQCache.load(FAQ_CACHE_FILE, snapshot.version)
+    if cache is None and rag.faq_cache is not None:
+        cache = rag.faq_cache.carried_forward(snapshot)
+    if cache is not None:
+        rag.faq_cache = cache
+    if cache is None or cache.stale:
+        faq_warmer.request()
+
+rag.on_swap.append(refresh_faq_cache)
+
+# Optionally pick up index rebuilds automatically
+if os.getenv("WATCH_INDEX") == "1":
+    SnapshotWatcher(rag, RAG_INDEX_FILE, interval=float(os.getenv("WATCH_INTERVAL", "5"))).start()
+
+# Uploaded documents are ingested into the live index by background workers
+INGEST_DIR = os.getenv("INGEST_DIR", "college_data/uploads")
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "25")) * 1024 * 1024
+# Ingested chunks are saved into RAG_INDEX_FILE after each job. With INGEST_PERSIST=0
+# they are kept in memory only, and every upload still on disk is ingested again on
+# the next start; either way, uploads a restart interrupted are queued again here.
+ingestion = IngestionQueue(
+    rag,
+    workers=int(os.getenv("INGEST_WORKERS", "2")),
+    persist_path=RAG_INDEX_FILE if os.getenv("INGEST_PERSIST", "1") == "1" else None,
+)
+ingestion.requeue_uploads(INGEST_DIR)
+
+def client_id() -> str:
+    """Identify the caller by address (the original client's when TRUSTED_PROXIES is set)"""
+    return request.remote_addr or 'unknown'
+
 @app.route('/')
 def home():
     return "IIIT Nagpur AI Chatbot API is running!"
 
+@app.route('/metrics')
+def metrics():
+    return jsonify(dict(admission.metrics(), ingestion=ingestion.metrics(),
+                        query_log_dropped=query_log.dropped))
+
+def is_admin() -> bool:
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/snapshot')
+def snapshot_info():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(dict(rag.snapshot.info(), reloading=rag.reloading))
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_index():
+    """Load the index file in the background and swap it in without downtime"""
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    if not rag.reload(RAG_INDEX_FILE):
+        return jsonify({"status": "already reloading", "version": rag.index_version}), 409
+    return jsonify({"status": "reloading", "version": rag.index_version}), 202
+
+@app.route('/ingest', methods=['POST'])
+def ingest_document():
+    """Queue an uploaded PDF or .txt file (multipart field "file") for indexing"""
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    upload = request.files.get('file')
+    filename = secure_filename(upload.filename or '') if upload else ''
+    if not filename:
+        return jsonify({"error": "No file provided"}), 400
+    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        return jsonify({"error": f"Unsupported file type, expected {', '.join(SUPPORTED_EXTENSIONS)}"}), 415
+    
+    os.makedirs(INGEST_DIR, exist_ok=True)
+    path = upload_path(INGEST_DIR, filename)
+    doc_type = request.form.get('doc_type', 'uploaded_document')
+    metadata = {key: request.form[key] for key in ('title', 'category') if request.form.get(key)}
+    upload.save(path)
+    save_upload_info(path, doc_type, metadata)
+    try:
+        job = ingestion.submit(path, filename, doc_type, metadata)
+    except ValueError as e:
+        remove_upload(path)
+        return jsonify({"error": str(e)}), 409
+    
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = f"/ingest/jobs/{job.id}"
+    return response, 202
+
+@app.route('/ingest/jobs')
+def ingest_jobs():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({"jobs": [job.to_dict() for job in ingestion.jobs(limit)], **ingestion.metrics()})
+
+@app.route('/ingest/jobs/<job_id>')
+def ingest_job_status(job_id):
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    job = ingestion.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     try:
+        admission.admit(client_id())
         data = request.get_json()
         question = data.get('question', '')
         
@@ -61,16 +212,23 @@ def ask_question():
         
         # Get answer from RAG
         result = rag.generate_answer(question)
+        query_log.record(question, result.get('path'))
         
         return jsonify({
             "question": question,
             "answer": result['answer'],
             "sources": result['sources'][:2] if result['sources'] else [],
-            "images": result['images']
+            "images": result['images'],
+            "path": result.get('path'),
+            "confidence": result.get('confidence')
         })
         
+    except Rejected as e:
+        response = jsonify({"error": e.reason, "retry_after": e.retry_after_header})
+        response.headers['Retry-After'] = e.retry_after_header
+        return response, e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=False, host="0.0.0.0", port=5000, use_reloader=False)
+    app.run(debug=False, host="0.0.0.0", port=int(os.getenv("PORT", "5000")), use_reloader=False)
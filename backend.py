@@ -4,8 +4,10 @@ import numpy as np
 import faiss
 import PyPDF2
 from typing import Dict, List, Tuple
-from groq import Groq
 from sentence_transformers import SentenceTransformer
+from llm_client import LLMClient, LLMUnavailableError
+from chunk_store import CompressedChunkStore
+from metadata_store import MetadataStore
 
 # --- RAG SYSTEM CLASS ---
 
@@ -13,8 +15,8 @@ class CollegeRAGSystem:
     def __init__(self, groq_api_key: str):
         """Initialize the RAG system components and Groq client."""
         try:
-            self.client = Groq(api_key=groq_api_key)
             self.model_name = "llama-3.1-8b-instant"
+            self.llm = LLMClient(groq_api_key, model=self.model_name)
             self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
             self.embedding_dim = 384
             self.index = faiss.IndexFlatL2(self.embedding_dim)
@@ -36,8 +38,16 @@ class CollegeRAGSystem:
             with open(filename, 'rb') as f:
                 data = pickle.load(f)
             
-            self.documents = data['documents']
-            self.metadata = data['metadata']
+            if 'documents' in data:
+                self.documents = data['documents']
+            else:  # saved with a compressed chunk store (see chunk_store.py)
+                store = CompressedChunkStore(os.path.join(os.path.dirname(filename), data['chunks_file']))
+                self.documents = list(store)
+                store.close()
+            if 'metadata' in data:
+                self.metadata = data['metadata']
+            else:  # saved with columnar metadata (see metadata_store.py)
+                self.metadata = MetadataStore.from_columns(data['metadata_columns']).to_dicts()
             self.index = faiss.deserialize_index(data['index'])
             print(f"✓ Loaded RAG system with {len(self.documents)} chunks from {filename}")
         except Exception as e:
@@ -127,24 +137,35 @@ Answer the question based on the context above. Be helpful and concise."""
         
         # Step 4: Generate response using Groq
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
+            answer = self.llm.chat(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.3,
                 max_tokens=500
             )
-            answer = response.choices[0].message.content
-        except Exception as e:
-            answer = f"Error generating response (Groq API): {str(e)}"
+        except LLMUnavailableError:
+            # Upstream is down or too slow: answer from the retrieved text alone
+            answer = self._retrieval_only_answer(search_results)
         
         return {
             "answer": answer,
             "sources": sources,
         }
 
+    def _retrieval_only_answer(self, search_results: List[Tuple[str, Dict]], max_chars: int = 600) -> str:
+        """Fallback answer built from the best retrieved chunk when the LLM is unavailable (same wording as college_rag.py)"""
+        if not search_results:
+            return "The AI assistant is temporarily unavailable. Please try again shortly."
+        doc, meta = search_results[0][:2]
+        excerpt = doc if len(doc) <= max_chars else doc[:max_chars].rsplit(' ', 1)[0] + "..."
+        source = meta.get('title', meta.get('source', 'college database'))
+        return (
+            "The AI assistant is temporarily unavailable, but here is the most relevant "
+            f"information I found ({source}):\n\n{excerpt}"
+        )
+
 # --- DATA BUILDER FUNCTION ---
 
 def run_data_builder(groq_api_key: str):
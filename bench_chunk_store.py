@@ -0,0 +1,124 @@
+"""Compare chunk-text memory and access latency: in-memory list vs compressed store.
+
+Also compares the peak memory of loading the index with its texts in the
+pickle against loading it saved with a chunk store (IndexSnapshot.to_file).
+
+    python bench_chunk_store.py --index college_rag_complete.pkl
+"""
+import argparse
+import gc
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from chunk_store import CompressedChunkStore
+from index_snapshot import IndexSnapshot
+
+
+def traced(load):
+    """Run load() and return (result, bytes still allocated by it, peak bytes allocated while it ran)"""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def access_latency(documents, queries, top_k: int) -> float:
+    """Mean microseconds to fetch the top_k chunk texts of one query"""
+    start = time.perf_counter()
+    for ids in queries:
+        for idx in ids[:top_k]:
+            documents[idx]
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compressed chunk store")
+    parser.add_argument("--index", default="college_rag_complete.pkl")
+    parser.add_argument("--store", default="/tmp/bench.chunks")
+    parser.add_argument("--codec", choices=["zstd", "zlib"], default=None)
+    parser.add_argument("--block-size", type=int, default=8)
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Whole index loads: texts pickled in the index file vs saved to a chunk store
+    snapshot = IndexSnapshot.from_file(args.index)
+    workdir = tempfile.mkdtemp()
+    list_file = os.path.join(workdir, "list.pkl")
+    store_file = os.path.join(workdir, "store.pkl")
+    snapshot.to_file(list_file, chunk_store=False)
+    snapshot.to_file(store_file, chunk_store=True)
+    del snapshot
+    _, _, list_load_peak = traced(lambda: IndexSnapshot.from_file(list_file))
+    loaded, _, store_load_peak = traced(lambda: IndexSnapshot.from_file(store_file, chunk_store=True))
+    loaded.documents.close()
+    del loaded
+
+    with open(list_file, "rb") as f:
+        raw = f.read()
+    list_file_size = os.path.getsize(list_file)
+    store_file_size = os.path.getsize(store_file) + sum(
+        os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir) if name.endswith(".chunks"))
+    shutil.rmtree(workdir)
+
+    # In-memory list, as IndexSnapshot holds it without a chunk store
+    documents, list_bytes, _ = traced(lambda: pickle.loads(raw)["documents"])
+    del raw
+
+    build_start = time.perf_counter()
+    CompressedChunkStore.build(documents, args.store, block_size=args.block_size,
+                               codec=args.codec, cache_size=args.cache_size).close()
+    build_seconds = time.perf_counter() - build_start
+    store, store_bytes, _ = traced(lambda: CompressedChunkStore(args.store, cache_size=args.cache_size))
+
+    # Skewed access: a few chunks (FAQ-like lookups) get most of the traffic
+    rng = random.Random(args.seed)
+    n = len(documents)
+    weights = [1.0 / (rank + 1) for rank in range(n)]
+    order = list(range(n))
+    rng.shuffle(order)
+    skewed = [rng.choices(order, weights=weights, k=args.top_k) for _ in range(args.queries)]
+    uniform = [rng.sample(range(n), args.top_k) for _ in range(args.queries)]
+
+    cold = CompressedChunkStore(args.store, cache_size=0)
+    rows = [
+        ("list", list_bytes, access_latency(documents, uniform, args.top_k),
+         access_latency(documents, skewed, args.top_k)),
+        ("store, no cache", store_bytes, access_latency(cold, uniform, args.top_k),
+         access_latency(cold, skewed, args.top_k)),
+    ]
+    warm_uniform = access_latency(store, uniform, args.top_k)
+    warm_skewed = access_latency(store, skewed, args.top_k)
+    # Heap for the LRU row includes the chunk strings a full cache holds (traced
+    # separately because tracemalloc slows the timed loops down)
+    sized = CompressedChunkStore(args.store, cache_size=args.cache_size)
+    _, cache_bytes, _ = traced(lambda: access_latency(sized, uniform + skewed, args.top_k))
+    sized.close()
+    rows.append((f"store, LRU {args.cache_size}", store_bytes + cache_bytes, warm_uniform, warm_skewed))
+
+    raw_text = sum(len(d.encode("utf-8")) for d in documents)
+    print(f"\n{n} chunks, {raw_text / 1024:.0f} KB of UTF-8 text; "
+          f"store file {store.disk_size / 1024:.0f} KB ({store.codec}, "
+          f"{raw_text / store.disk_size:.1f}x), built in {build_seconds:.2f}s")
+    print(f"index file {os.path.getsize(args.index) / 1024:.0f} KB\n")
+    print(f"{'backend':<20}{'heap KB':>10}{'uniform us/query':>20}{'skewed us/query':>20}")
+    for name, heap, uniform_us, skewed_us in rows:
+        print(f"{name:<20}{heap / 1024:>10.0f}{uniform_us:>20.1f}{skewed_us:>20.1f}")
+    print(f"\nLRU: {store.cache_info()}")
+    print(f"\nPeak memory loading the index: {list_load_peak / 1024:.0f} KB with the texts in the pickle "
+          f"({list_file_size / 1024:.0f} KB on disk), {store_load_peak / 1024:.0f} KB with a chunk store "
+          f"({store_file_size / 1024:.0f} KB on disk, chunk store included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Encode latency, throughput and memory of each embedding backend.
+
+Each backend runs in a fresh subprocess so import time and RSS are not
+shared between them:
+
+    python embeddings.py export --output onnx_model
+    python bench_embeddings.py --index college_rag_complete.pkl --threads 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process"""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def worker(args):
+    """Benchmark one backend in this process and print a JSON result"""
+    from index_snapshot import IndexSnapshot
+
+    documents = list(IndexSnapshot.from_file(args.index).documents)
+    texts = documents[:args.batch_texts]
+    queries = [" ".join(doc.split()[:12]) for doc in documents[:args.queries]]
+    baseline_rss = rss_mb()
+
+    start = time.perf_counter()
+    from embeddings import load_backend
+    backend = load_backend(args.worker, args.model_dir, args.threads)
+    load_seconds = time.perf_counter() - start
+    backend.encode(queries[:4])  # warm up
+
+    latencies = []
+    for query in queries:
+        t = time.perf_counter()
+        backend.encode(query)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    t = time.perf_counter()
+    vectors = backend.encode(texts, batch_size=args.batch_size)
+    batch_seconds = time.perf_counter() - t
+
+    np.save(os.path.join(args.out_dir, f"{args.worker}.npy"), vectors)
+    print(json.dumps({
+        "backend": args.worker,
+        "load_s": load_seconds,
+        "rss_mb": rss_mb() - baseline_rss,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "chunks_per_s": len(texts) / batch_seconds,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--index", default="college_rag_complete.pkl")
+    parser.add_argument("--model-dir", default="onnx_model")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads per backend")
+    parser.add_argument("--queries", type=int, default=200, help="single-query encodes to time")
+    parser.add_argument("--batch-texts", type=int, default=256, help="chunks for the throughput run")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--out-dir", default="/tmp/bench_embeddings")
+    parser.add_argument("--json", help="also write the results here")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    results = []
+    for name in args.backends:
+        cmd = [sys.executable, __file__, "--worker", name, "--index", args.index,
+               "--model-dir", args.model_dir, "--queries", str(args.queries),
+               "--batch-texts", str(args.batch_texts), "--batch-size", str(args.batch_size),
+               "--out-dir", args.out_dir]
+        if args.threads:
+            cmd += ["--threads", str(args.threads)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"✗ {name}: {(proc.stderr.strip().splitlines() or ['failed'])[-1]}")
+            continue
+        results.append(json.loads(lines[-1]))
+
+    # Agreement with the PyTorch embeddings of the same chunks
+    reference_path = os.path.join(args.out_dir, "torch.npy")
+    if os.path.exists(reference_path) and any(r["backend"] == "torch" for r in results):
+        reference = np.load(reference_path)
+        for result in results:
+            vectors = np.load(os.path.join(args.out_dir, f"{result['backend']}.npy"))
+            result["min_cosine"] = float(np.sum(reference * vectors, axis=1).min())
+
+    print(f"\n{'backend':<12}{'load s':>9}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'chunks/s':>11}{'min cos':>10}")
+    for r in results:
+        cosine = f"{r['min_cosine']:.4f}" if "min_cosine" in r else "-"
+        print(f"{r['backend']:<12}{r['load_s']:>9.2f}{r['rss_mb']:>9.0f}{r['query_p50_ms']:>9.2f}"
+              f"{r['query_p95_ms']:>9.2f}{r['chunks_per_s']:>11.1f}{cosine:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
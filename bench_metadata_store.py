@@ -0,0 +1,94 @@
+"""tracemalloc report: per-chunk metadata dicts vs the columnar MetadataStore.
+
+Load times compare what IndexSnapshot.from_file does with each file format:
+unpickling dicts, converting those dicts to a store (older files loaded with
+COLUMNAR_METADATA=1), and unpickling saved columns into a store.
+
+    python bench_metadata_store.py --index college_rag_complete.pkl
+"""
+import argparse
+import gc
+import pickle
+import time
+import tracemalloc
+
+from index_snapshot import IndexSnapshot
+from metadata_store import MetadataStore
+
+
+def traced(load):
+    """Run load() and return (result, bytes still allocated by it)"""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def timed(fn, repeat: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar metadata store")
+    parser.add_argument("--index", default="college_rag_complete.pkl")
+    parser.add_argument("--scale", type=int, default=1, help="replicate rows to simulate a larger corpus")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    metadata = IndexSnapshot.from_file(args.index).metadata
+    # Fresh dicts and strings per copy, as the builders produce them
+    scaled = [
+        {key: value.encode("utf-8").decode("utf-8") if isinstance(value, str) else value
+         for key, value in meta.items()}
+        for _ in range(args.scale) for meta in metadata
+    ]
+    raw_metadata = pickle.dumps(scaled)
+
+    rows, dict_bytes = traced(lambda: pickle.loads(raw_metadata))
+    store, store_bytes = traced(lambda: MetadataStore.from_dicts(rows))
+    store_pickle = pickle.dumps(store.to_columns())
+    reloaded, reloaded_bytes = traced(lambda: MetadataStore.from_columns(pickle.loads(store_pickle)))
+
+    n = len(rows)
+    wanted_sources = ["hostel_fee.pdf", "fee_structure.txt", "hostel_facilities.txt"]
+    assert reloaded.to_dicts() == [dict(r) for r in rows]
+    list_ids = [i for i, m in enumerate(rows) if m.get("source") in wanted_sources and m.get("type") == "text"]
+    assert list(store.filter(source=wanted_sources, type="text")) == list_ids
+
+    print(f"\n{n} metadata rows, {len(store.columns)} columns, {len(store.strings)} distinct strings\n")
+    print(f"{'representation':<28}{'heap KB':>10}{'bytes/row':>12}{'pickle KB':>12}")
+    print(f"{'list of dicts':<28}{dict_bytes / 1024:>10.1f}{dict_bytes / n:>12.1f}{len(raw_metadata) / 1024:>12.1f}")
+    print(f"{'MetadataStore':<28}{store_bytes / 1024:>10.1f}{store_bytes / n:>12.1f}{len(store_pickle) / 1024:>12.1f}")
+    print(f"{'MetadataStore (from columns)':<28}{reloaded_bytes / 1024:>10.1f}{reloaded_bytes / n:>12.1f}")
+    print(f"\nreduction: {dict_bytes / store_bytes:.1f}x heap, {len(raw_metadata) / len(store_pickle):.1f}x on disk")
+
+    load_dicts = timed(lambda: pickle.loads(raw_metadata), 20)
+    convert_dicts = timed(lambda: MetadataStore.from_dicts(pickle.loads(raw_metadata)), 20)
+    load_columns = timed(lambda: MetadataStore.from_columns(pickle.loads(store_pickle)), 20)
+    append = timed(lambda: store.extend(rows[:10]), 20)
+    scan_list = timed(lambda: [i for i, m in enumerate(rows)
+                               if m.get("source") in wanted_sources and m.get("type") == "text"], args.repeat)
+    scan_store = timed(lambda: store.filter(source=wanted_sources, type="text"), args.repeat)
+    rows_list = timed(lambda: [rows[i].get("source") for i in range(3)], args.repeat)
+    rows_store = timed(lambda: [store[i].get("source") for i in range(3)], args.repeat)
+
+    print(f"\n{'load (us)':<28}{'time':>12}")
+    print(f"{'dicts':<28}{load_dicts:>12.1f}")
+    print(f"{'dicts -> store':<28}{convert_dicts:>12.1f}")
+    print(f"{'columns -> store':<28}{load_columns:>12.1f}")
+    print(f"{'store.extend(10 rows)':<28}{append:>12.1f}")
+
+    print(f"\n{'operation (us)':<28}{'dicts':>12}{'store':>12}")
+    print(f"{'filter source+type':<28}{scan_list:>12.1f}{scan_store:>12.1f}")
+    print(f"{'read 3 rows (top_k)':<28}{rows_list:>12.2f}{rows_store:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
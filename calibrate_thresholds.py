@@ -0,0 +1,74 @@
+"""Calibrate the answer / not-found confidence thresholds for a saved index.
+
+Every golden question (see golden_questions.json) is searched against the
+index and labeled by whether its top-1 chunk is relevant to it, i.e. whether
+the extractive fast path would return the right text. Questions none of whose
+target sources are in the index can only be labeled wrong and are left out. The thresholds picked
+by CollegeRAGSystem.calibrate_confidence are stored next to the index, and
+app.py picks them up on load and reload.
+
+    python calibrate_thresholds.py --index college_rag_complete.pkl --target-precision 0.95
+    python calibrate_thresholds.py --dry-run   # print, don't store
+
+Re-run it after rebuilding the index or switching the embedding backend.
+"""
+import argparse
+import os
+import time
+
+from college_rag import CollegeRAGSystem
+from evaluate_retrieval import DEFAULT_GOLDEN, load_golden, reachability, target_hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate confidence thresholds on the golden set")
+    parser.add_argument("--index", default=os.getenv("RAG_INDEX_FILE", "college_rag_complete.pkl"))
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--target-precision", type=float, default=0.95,
+                        help="required top-1 precision of the extractive (no LLM) path")
+    parser.add_argument("--dry-run", action="store_true", help="print the thresholds without storing them")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    rag = CollegeRAGSystem(os.getenv("GROQ_API_KEY", "unused"))  # retrieval only, the LLM is never called
+    rag.load(args.index)
+    if len(rag.documents) == 0:
+        raise SystemExit(f"✗ {args.index} has no chunks to calibrate on")
+
+    coverage = reachability(rag.metadata, golden)
+    if coverage["unreachable"]:
+        print(f"⚠ Leaving out {len(coverage['unreachable'])} questions with no target source in the index: "
+              f"{', '.join(coverage['unreachable'])}")
+    if coverage["source_only"]:
+        print(f"⚠ Chunks have no page numbers; {len(coverage['source_only'])} questions are labeled "
+              f"on the target source alone")
+    skipped = set(coverage["unreachable"])
+
+    labeled = []
+    for question in golden["questions"]:
+        if question["id"] in skipped:
+            continue
+        targets = question["relevant"]
+        labeled.append((question["question"],
+                        lambda meta, targets=targets: any(target_hit(meta, t) for t in targets)))
+    if not labeled:
+        raise SystemExit(f"✗ No golden question has a target source in {args.index}")
+    rag.calibrate_confidence(labeled, args.target_precision)
+
+    if args.dry_run:
+        return
+    rag.save_thresholds(
+        args.index,
+        golden_version=golden.get("version"),
+        golden_sha1=golden["sha1"],
+        questions=len(labeled),
+        skipped_questions=sorted(skipped),
+        source_only_questions=len(coverage["source_only"]),
+        target_precision=args.target_precision,
+        embedding_backend=rag.embedding_model.name,
+        calibrated_at=time.time(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Compressed on-disk store for chunk texts.
+
+Chunk texts are grouped into small blocks, each compressed with a dictionary
+trained on the corpus (zstd when `zstandard` is installed, otherwise zlib with
+a preset dictionary). The 50-word overlaps between neighbouring chunks land
+in the same block, so they compress away. The file is memory-mapped and only
+the blocks holding requested chunks are decompressed; recently used chunks
+stay in an LRU cache.
+
+CompressedChunkStore is a read-only sequence, so it can stand in for the
+`documents` list of an IndexSnapshot:
+
+    store = CompressedChunkStore.build(documents, "college_rag_complete.pkl.chunks")
+    store[42]
+
+The file cannot grow; live ingestion uses store.appended(texts), a view with
+the new chunks in an in-memory tail, until the next save writes a new store
+with store.write_appended(texts, filename), copying the compressed blocks.
+"""
+import itertools
+import mmap
+import os
+import pickle
+import struct
+import threading
+import weakref
+import zlib
+from collections import Counter, OrderedDict, namedtuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"CHNKSTR1"
+_HEADER_LEN = struct.Struct("<Q")
+ZLIB_DICT_SIZE = 32 * 1024  # zlib windows are 32 KB, larger dictionaries are ignored
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def _zlib_dictionary(texts: Sequence[str], size: int = ZLIB_DICT_SIZE) -> bytes:
+    """Preset dictionary of the most frequent runs of words in the corpus"""
+    counts = Counter()
+    for text in texts:
+        words = text.split()
+        for i in range(0, max(len(words) - 8, 1), 4):
+            counts[" ".join(words[i:i + 8])] += 1
+    parts, total = [], 0
+    for phrase, count in counts.most_common():
+        if count < 2:
+            break
+        data = (phrase + " ").encode("utf-8")
+        if total + len(data) > size:
+            break
+        parts.append(data)
+        total += len(data)
+    # zlib favours matches near the end of the dictionary, so put the most common last
+    return b"".join(reversed(parts))
+
+
+def _compressor(codec: str, dictionary: bytes, level: int) -> Callable[[bytes], bytes]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required for the zstd codec (pip install zstandard)")
+        zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=level, dict_data=zdict).compress
+
+    def compress(data: bytes) -> bytes:
+        c = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+        return c.compress(data) + c.flush()
+    return compress
+
+
+def _compress_blocks(encoded: Sequence[bytes], block_size: int, compress: Callable[[bytes], bytes],
+                     start: int = 0) -> Tuple[List[bytes], List[int], List[int]]:
+    """Compressed blocks, their end offsets (from start) and each block's chunk offsets"""
+    blocks, block_offsets, chunk_offsets = [], [], []
+    end = start
+    for i in range(0, len(encoded), block_size):
+        members = encoded[i:i + block_size]
+        offset = 0
+        for member in members:
+            chunk_offsets.append(offset)
+            offset += len(member)
+        chunk_offsets.append(offset)
+        blocks.append(compress(b"".join(members)))
+        end += len(blocks[-1])
+        block_offsets.append(end)
+    return blocks, block_offsets, chunk_offsets
+
+
+def _write_store(filename: str, header: Dict, blocks: Iterable[bytes]):
+    header = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(header)))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp, filename)
+
+
+def _release(mapped: mmap.mmap, file):
+    mapped.close()
+    file.close()
+
+
+class CompressedChunkStore(Sequence):
+    """Read-only, memory-mapped sequence of compressed chunk texts
+
+    The mapping and file are closed by close() or as soon as the store is
+    garbage (i.e. when the last snapshot using it is freed).
+    """
+
+    def __init__(self, filename: str, cache_size: int = 256):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._finalizer = weakref.finalize(self, _release, self._mmap, self._file)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{filename} is not a chunk store")
+        start = len(MAGIC) + _HEADER_LEN.size
+        (header_len,) = _HEADER_LEN.unpack(self._mmap[len(MAGIC):start])
+        header = pickle.loads(self._mmap[start:start + header_len])
+
+        self.codec = header["codec"]
+        self.version = header.get("version")
+        self.block_size = header["block_size"]
+        self._count = header["count"]
+        self._data_start = start + header_len
+        self._block_offsets = header["block_offsets"]     # uint64, len = blocks + 1
+        self._chunk_offsets = header["chunk_offsets"]     # uint32 within the block, len = count + blocks
+        self._dictionary = header["dictionary"]
+        self._decompressor = self._make_decompressor()
+
+        # LRU of decoded chunks; kept on the instance (no bound-method wrapper) so the
+        # store has no reference cycle and is freed by reference counting
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @classmethod
+    def build(cls, texts: Sequence[str], filename: str, block_size: int = 8,
+              codec: Optional[str] = None, version: Optional[str] = None,
+              dict_size: int = 64 * 1024, level: int = 9, cache_size: int = 256) -> "CompressedChunkStore":
+        """Compress texts into a new store file and open it"""
+        codec = codec or ("zstd" if zstandard is not None else "zlib")
+        encoded = [text.encode("utf-8") for text in texts]
+
+        if codec == "zstd":
+            if zstandard is None:
+                raise ImportError("zstandard is required for the zstd codec (pip install zstandard)")
+            samples = [b"".join(encoded[i:i + block_size]) for i in range(0, len(encoded), block_size)]
+            try:
+                dictionary = zstandard.train_dictionary(dict_size, samples).as_bytes()
+            except zstandard.ZstdError:
+                dictionary = b""  # corpus too small to train on
+        elif codec == "zlib":
+            dictionary = _zlib_dictionary(texts)
+        else:
+            raise ValueError(f"Unknown codec: {codec}")
+
+        blocks, block_offsets, chunk_offsets = _compress_blocks(
+            encoded, block_size, _compressor(codec, dictionary, level))
+        _write_store(filename, {
+            "codec": codec,
+            "version": version,
+            "block_size": block_size,
+            "count": len(encoded),
+            "block_offsets": np.array([0] + block_offsets, dtype=np.uint64),
+            "chunk_offsets": np.array(chunk_offsets, dtype=np.uint32),
+            "dictionary": dictionary,
+        }, blocks)
+        return cls(filename, cache_size=cache_size)
+
+    def write_appended(self, texts: Sequence[str], filename: str, version: Optional[str] = None,
+                       level: int = 9) -> "CompressedChunkStore":
+        """Write this store followed by texts to a new file and open it
+
+        Full blocks are copied still compressed, with the same dictionary;
+        only a partly filled last block is decompressed, to be refilled.
+        """
+        full = self._count // self.block_size
+        members = []
+        if self._count % self.block_size:
+            data = self._read_block(full)
+            base = full * (self.block_size + 1)
+            offsets = self._chunk_offsets[base:base + self._count - full * self.block_size + 1]
+            members = [data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        members += [text.encode("utf-8") for text in texts]
+
+        kept = int(self._block_offsets[full])
+        blocks, block_offsets, chunk_offsets = _compress_blocks(
+            members, self.block_size, _compressor(self.codec, self._dictionary, level), start=kept)
+        copied = (self._mmap[self._data_start + offset:self._data_start + min(offset + (1 << 20), kept)]
+                  for offset in range(0, kept, 1 << 20))
+        _write_store(filename, {
+            "codec": self.codec,
+            "version": version,
+            "block_size": self.block_size,
+            "count": full * self.block_size + len(members),
+            "block_offsets": np.concatenate([self._block_offsets[:full + 1],
+                                             np.array(block_offsets, dtype=np.uint64)]),
+            "chunk_offsets": np.concatenate([self._chunk_offsets[:full * (self.block_size + 1)],
+                                             np.array(chunk_offsets, dtype=np.uint32)]),
+            "dictionary": self._dictionary,
+        }, itertools.chain(copied, blocks))
+        return CompressedChunkStore(filename, cache_size=self.cache_size)
+
+    def _make_decompressor(self):
+        if self.codec == "zstd":
+            if zstandard is None:
+                raise ImportError(f"{self.filename} uses zstd; install zstandard to read it")
+            zdict = zstandard.ZstdCompressionDict(self._dictionary) if self._dictionary else None
+
+            def decompress_zstd(data: bytes) -> bytes:
+                # Decompressor objects are not thread safe, so use one per call
+                return zstandard.ZstdDecompressor(dict_data=zdict).decompress(data)
+            return decompress_zstd
+        dictionary = self._dictionary
+
+        def decompress(data: bytes) -> bytes:
+            d = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            return d.decompress(data) + d.flush()
+        return decompress
+
+    def _read_block(self, block: int) -> bytes:
+        start = self._data_start + int(self._block_offsets[block])
+        end = self._data_start + int(self._block_offsets[block + 1])
+        return self._decompressor(self._mmap[start:end])
+
+    def _read_chunk(self, idx: int) -> str:
+        block = idx // self.block_size
+        base = idx + block  # each block stores one extra end offset
+        data = self._read_block(block)
+        return data[self._chunk_offsets[base]:self._chunk_offsets[base + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._count))]
+        idx = int(idx)
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("chunk index out of range")
+        return self._cached_chunk(idx)
+
+    def _cached_chunk(self, idx: int) -> str:
+        with self._cache_lock:
+            text = self._cache.get(idx)
+            if text is not None:
+                self._cache.move_to_end(idx)
+                self._hits += 1
+                return text
+            self._misses += 1
+        text = self._read_chunk(idx)
+        if self.cache_size:
+            with self._cache_lock:
+                self._cache[idx] = text
+                self._cache.move_to_end(idx)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        """Sequential scan one block at a time, bypassing the LRU"""
+        for block in range(len(self._block_offsets) - 1):
+            data = self._read_block(block)
+            first = block * self.block_size
+            for idx in range(first, min(first + self.block_size, self._count)):
+                base = idx + block
+                yield data[self._chunk_offsets[base]:self._chunk_offsets[base + 1]].decode("utf-8")
+
+    def cache_info(self) -> CacheInfo:
+        with self._cache_lock:
+            return CacheInfo(self._hits, self._misses, self.cache_size, len(self._cache))
+
+    @property
+    def disk_size(self) -> int:
+        return os.path.getsize(self.filename)
+
+    def close(self):
+        self._finalizer()
+
+    def appended(self, texts: Sequence[str]) -> "AppendedChunks":
+        """This store followed by texts, without copying or decompressing the store"""
+        return AppendedChunks(self, list(texts))
+
+    def __getstate__(self):
+        raise TypeError("CompressedChunkStore is backed by a file; convert with list() to pickle")
+
+
+class AppendedChunks(Sequence):
+    """A CompressedChunkStore with chunks appended after it was built, kept in memory"""
+
+    def __init__(self, store: CompressedChunkStore, tail: List[str]):
+        self.store = store
+        self.tail = tail
+
+    def appended(self, texts: Sequence[str]) -> "AppendedChunks":
+        return AppendedChunks(self.store, self.tail + list(texts))
+
+    def __len__(self) -> int:
+        return len(self.store) + len(self.tail)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("chunk index out of range")
+        if idx < len(self.store):
+            return self.store[idx]
+        return self.tail[idx - len(self.store)]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.store
+        yield from self.tail
+
+
+def open_or_build(texts: List[str], filename: str, version: Optional[str] = None,
+                  **kwargs) -> CompressedChunkStore:
+    """Open the store for this index version, rebuilding it if stale or missing"""
+    if os.path.exists(filename):
+        try:
+            store = CompressedChunkStore(filename, cache_size=kwargs.get("cache_size", 256))
+            if store.version == version and len(store) == len(texts):
+                return store
+            store.close()
+        except (ValueError, ImportError, OSError) as e:
+            print(f"Rebuilding chunk store {filename}: {e}")
+    return CompressedChunkStore.build(texts, filename, version=version, **kwargs)
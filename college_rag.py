@@ -1,35 +1,87 @@
 
 import os
+import re
 import json
-import pickle
-from groq import Groq
-from sentence_transformers import SentenceTransformer
-import faiss
+import threading
+from contextlib import nullcontext
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import PyPDF2
 from PIL import Image
+from llm_client import LLMClient, LLMUnavailableError
+from index_snapshot import IndexSnapshot, track_release
+from embeddings import EmbeddingBackend, load_backend
 
 class CollegeRAGSystem:
-    def __init__(self, groq_api_key: str):
-        """Initialize the RAG system with Groq API"""
-        self.client = Groq(api_key=groq_api_key)
+    # Confidence gate on the top cosine similarity, used until
+    # calibrate_thresholds.py has stored calibrated ones next to the index
+    DEFAULT_ANSWER_THRESHOLD = 0.75     # at or above: extractive answer, no LLM call
+    DEFAULT_NOT_FOUND_THRESHOLD = 0.20  # below: "not found", no LLM call
+
+    def __init__(self, groq_api_key: str, llm_options: Optional[Dict] = None, use_shards: bool = False,
+                 chunk_store: bool = False, columnar_metadata: bool = False,
+                 embedding_backend: Optional[EmbeddingBackend] = None):
+        """Initialize the RAG system with Groq API
+
+        llm_options are passed to LLMClient (timeouts, retries, hedging, base_url).
+        use_shards splits loaded indexes by document family and routes each
+        query to the relevant shards (see sharding.py).
+        chunk_store keeps loaded chunk texts compressed on disk and saves them
+        that way, outside the index file (see chunk_store.py).
+        columnar_metadata keeps loaded metadata in a MetadataStore and saves it
+        in that columnar form (see metadata_store.py).
+        embedding_backend defaults to load_backend(), i.e. EMBEDDING_BACKEND (see embeddings.py).
+        """
         self.model_name = "llama-3.1-8b-instant"
+        self.llm = LLMClient(groq_api_key, model=self.model_name, **(llm_options or {}))
         
         # Initialize embedding model (converts text to numbers)
         print("Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.embedding_dim = 384  # Dimension of all-MiniLM-L6-v2
-        
-        # Initialize FAISS index (vector database)
-        self.index = faiss.IndexFlatL2(self.embedding_dim)
-        
-        # Store document metadata
-        self.documents = []  # List of document texts
-        self.metadata = []   # List of metadata for each document
+        self.embedding_model = embedding_backend or load_backend()
+        self.embedding_dim = self.embedding_model.dim  # 384 for all-MiniLM-L6-v2
+        
+        # FAISS index (vector database), document texts and metadata live in one
+        # snapshot that is replaced atomically on reload (see index_snapshot.py)
+        self.snapshot = IndexSnapshot.empty(self.embedding_dim)
+        self.use_shards = use_shards
+        self.chunk_store = chunk_store
+        self.columnar_metadata = columnar_metadata
+        self.on_swap = []  # callbacks run with the new snapshot after a swap
+        self.reloading = False
+        self._reload_lock = threading.Lock()
+        self._write_lock = threading.RLock()  # serializes snapshot swaps (reloads, live ingestion)
+        
+        # Replaced by load_thresholds() when the index has calibrated ones
+        self.answer_threshold = self.DEFAULT_ANSWER_THRESHOLD
+        self.not_found_threshold = self.DEFAULT_NOT_FOUND_THRESHOLD
+        
+        # Optional context manager factory wrapped around every LLM call (admission control)
+        self.llm_gate = None
+        
+        # Precomputed answers for frequent questions (see faq_cache.py)
+        self.faq_cache = None
         
         print("✓ RAG System initialized!")
     
+    # Views of the current snapshot. Concurrent readers should take
+    # self.snapshot once instead, so every field comes from the same version.
+    @property
+    def index(self):
+        return self.snapshot.index
+    
+    @property
+    def documents(self) -> List[str]:
+        return self.snapshot.documents
+    
+    @property
+    def metadata(self) -> List[Dict]:
+        return self.snapshot.metadata
+    
+    @property
+    def index_version(self) -> Optional[str]:
+        """Content hash of the saved/loaded index"""
+        return self.snapshot.version
+    
     def add_pdf(self, pdf_path: str, doc_type: str = "general"):
         """Add a PDF document to the knowledge base"""
         print(f"Processing PDF: {pdf_path}")
@@ -45,22 +97,26 @@ class CollegeRAGSystem:
                         # Split into chunks
                         chunks = self._chunk_text(text, chunk_size=500)
                         
-                        for chunk_idx, chunk in enumerate(chunks):
-                            if len(chunk.strip()) > 50:  # Skip very small chunks
-                                # Generate embedding
-                                embedding = self.embedding_model.encode(chunk)
-                                
-                                # Add to FAISS index
-                                self.index.add(np.array([embedding], dtype=np.float32))
-                                
-                                # Store document and metadata
-                                self.documents.append(chunk)
-                                self.metadata.append({
-                                    "source": os.path.basename(pdf_path),
-                                    "type": doc_type,
-                                    "page": page_num + 1,
-                                    "chunk": chunk_idx
-                                })
+                        kept = [(chunk_idx, chunk) for chunk_idx, chunk in enumerate(chunks)
+                                if len(chunk.strip()) > 50]  # Skip very small chunks
+                        if not kept:
+                            continue
+                        
+                        # Generate embeddings for the whole page in one batch
+                        embeddings = self._embed([chunk for _, chunk in kept])
+                        
+                        # Add to FAISS index
+                        self.index.add(np.asarray(embeddings, dtype=np.float32))
+                        
+                        # Store documents and metadata
+                        for chunk_idx, chunk in kept:
+                            self.documents.append(chunk)
+                            self.metadata.append({
+                                "source": os.path.basename(pdf_path),
+                                "type": doc_type,
+                                "page": page_num + 1,
+                                "chunk": chunk_idx
+                            })
             
             print(f"✓ Added {pdf_path} - Total documents: {len(self.documents)}")
             
@@ -71,15 +127,16 @@ class CollegeRAGSystem:
         """Add plain text to the knowledge base"""
         chunks = self._chunk_text(text, chunk_size=500)
         
-        for chunk_idx, chunk in enumerate(chunks):
-            if len(chunk.strip()) > 50:
-                embedding = self.embedding_model.encode(chunk)
-                self.index.add(np.array([embedding], dtype=np.float32))
-                
-                self.documents.append(chunk)
-                metadata_copy = metadata.copy()
-                metadata_copy['chunk'] = chunk_idx
-                self.metadata.append(metadata_copy)
+        kept = [(chunk_idx, chunk) for chunk_idx, chunk in enumerate(chunks) if len(chunk.strip()) > 50]
+        if kept:
+            embeddings = self._embed([chunk for _, chunk in kept])
+            self.index.add(np.asarray(embeddings, dtype=np.float32))
+        
+        for chunk_idx, chunk in kept:
+            self.documents.append(chunk)
+            metadata_copy = metadata.copy()
+            metadata_copy['chunk'] = chunk_idx
+            self.metadata.append(metadata_copy)
         
         print(f"✓ Added text: {metadata.get('title', 'Untitled')}")
     
@@ -87,7 +144,7 @@ class CollegeRAGSystem:
         """Add image metadata (for question papers, college photos)"""
         full_text = f"Image: {os.path.basename(image_path)}\nDescription: {description}"
         
-        embedding = self.embedding_model.encode(full_text)
+        embedding = self._embed(full_text)
         self.index.add(np.array([embedding], dtype=np.float32))
         
         self.documents.append(description)
@@ -100,7 +157,8 @@ class CollegeRAGSystem:
         
         print(f"✓ Added image metadata: {os.path.basename(image_path)}")
     
-    def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+    @staticmethod
+    def _chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """Split text into overlapping chunks"""
         words = text.split()
         chunks = []
@@ -112,39 +170,164 @@ class CollegeRAGSystem:
         
         return chunks if chunks else [text]
     
-    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, Dict]]:
-        """Search for relevant documents"""
-        if len(self.documents) == 0:
+    def _embed(self, text):
+        """Encode text (or a list, batched) to unit-length embeddings so L2 distances map to cosine similarity"""
+        return self.embedding_model.encode(text)
+    
+    def search_with_scores(self, query: str, top_k: int = 3,
+                           query_embedding: Optional[np.ndarray] = None) -> List[Tuple[str, Dict, float]]:
+        """Search for relevant documents, returning (text, metadata, cosine similarity)"""
+        snapshot = self.snapshot
+        if len(snapshot.documents) == 0:
             return []
         
         # Convert query to embedding
-        query_embedding = self.embedding_model.encode(query)
+        if query_embedding is None:
+            query_embedding = self._embed(query)
         
-        # Search in FAISS
-        distances, indices = self.index.search(
-            np.array([query_embedding], dtype=np.float32), 
-            min(top_k, len(self.documents))
-        )
+        # Search in FAISS (only the routed shards when sharding is on)
+        k = min(top_k, len(snapshot.documents))
+        if snapshot.shards is not None:
+            distances, indices = snapshot.shards.search(query, query_embedding, k)
+        else:
+            distances, indices = snapshot.index.search(np.array([query_embedding], dtype=np.float32), k)
         
         # Retrieve documents and metadata
         results = []
-        for idx in indices[0]:
-            if idx < len(self.documents):
-                results.append((self.documents[idx], self.metadata[idx]))
+        for distance, idx in zip(distances[0], indices[0]):
+            if 0 <= idx < len(snapshot.documents):
+                # Squared L2 between unit vectors: d = 2 - 2 * cos
+                score = 1.0 - float(distance) / 2.0
+                results.append((snapshot.documents[idx], snapshot.metadata[idx], score))
         
         return results
     
-    def generate_answer(self, query: str, top_k: int = 3) -> Dict:
-        """Main RAG pipeline: Search + Generate answer"""
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, Dict]]:
+        """Search for relevant documents"""
+        return [(doc, meta) for doc, meta, _ in self.search_with_scores(query, top_k)]
+    
+    def calibrate_confidence(self, labeled_queries: List[Tuple[str, Callable[[Dict], bool]]],
+                             target_precision: float = 0.95) -> Tuple[float, float]:
+        """Pick confidence thresholds from queries labeled by retrieval correctness
+        
+        Each query comes with a predicate telling whether a chunk's metadata
+        answers it, and is labeled by whether its top-1 chunk does. The answer
+        threshold is the lowest top score at which that chunk (which the
+        extractive path returns verbatim) is still right at least
+        target_precision of the time; the not-found threshold is the lowest
+        score at which a top chunk was right, so no correct retrieval is refused.
+        """
+        scored = []
+        for query, is_relevant in labeled_queries:
+            results = self.search_with_scores(query, top_k=1)
+            scored.append((results[0][2], bool(is_relevant(results[0][1]))) if results else (0.0, False))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        
+        answer_threshold = 1.01  # above any cosine score: no level is precise enough to skip the LLM
+        correct = 0
+        for rank, (score, top_correct) in enumerate(scored, 1):
+            correct += top_correct
+            if correct / rank >= target_precision:
+                answer_threshold = score
+        
+        correct_scores = [score for score, top_correct in scored if top_correct]
+        not_found_threshold = min(correct_scores) if correct_scores else self.not_found_threshold
+        
+        self.answer_threshold = answer_threshold
+        self.not_found_threshold = min(not_found_threshold, answer_threshold)
+        print(f"✓ Calibrated thresholds on {len(scored)} queries ({len(correct_scores)} top-1 correct): "
+              f"answer >= {self.answer_threshold:.3f}, not found < {self.not_found_threshold:.3f}")
+        return self.answer_threshold, self.not_found_threshold
+    
+    def save_thresholds(self, index_file: str, **info) -> str:
+        """Store the current thresholds next to an index file, with provenance in info"""
+        path = thresholds_path(index_file)
+        data = dict(info, answer_threshold=self.answer_threshold,
+                    not_found_threshold=self.not_found_threshold, index_version=self.index_version)
+        tmp = path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+        print(f"✓ Saved thresholds to {path}")
+        return path
+    
+    def load_thresholds(self, index_file: str) -> bool:
+        """Use the thresholds calibrated for an index file, if there are any
+
+        Thresholds calibrated with another embedding backend don't carry
+        over, the defaults are used instead. Thresholds calibrated on another
+        build of the index are kept, with a warning, unless the live index
+        only appended chunks to that build.
+        """
+        path = thresholds_path(index_file)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            answer_threshold = float(data['answer_threshold'])
+            not_found_threshold = float(data['not_found_threshold'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"✗ Ignoring thresholds in {path}: {e}")
+            return False
+        backend = data.get('embedding_backend')
+        if backend is not None and backend != self.embedding_model.name:
+            print(f"✗ Ignoring thresholds in {path}: calibrated with {backend}, "
+                  f"running {self.embedding_model.name}. Using the defaults, re-run calibrate_thresholds.py")
+            self.answer_threshold = self.DEFAULT_ANSWER_THRESHOLD
+            self.not_found_threshold = self.DEFAULT_NOT_FOUND_THRESHOLD
+            return False
+        version = data.get('index_version')
+        if version is not None and version != self.index_version and self.snapshot.appended_since(version) is None:
+            print(f"⚠ Thresholds in {path} were calibrated on index version {version}, "
+                  f"not {self.index_version}. Re-run calibrate_thresholds.py")
+        self.answer_threshold = answer_threshold
+        self.not_found_threshold = not_found_threshold
+        print(f"✓ Loaded thresholds from {path}: answer >= {self.answer_threshold:.3f}, "
+              f"not found < {self.not_found_threshold:.3f}")
+        return True
+    
+    def _extractive_answer(self, query_embedding: np.ndarray, doc: str, max_sentences: int = 3) -> str:
+        """Answer with the sentences of a chunk closest to the query, in reading order"""
+        sentences = _split_sentences(doc)
+        if len(sentences) <= max_sentences:
+            return " ".join(sentences)
+        
+        embeddings = np.asarray(self._embed(sentences), dtype=np.float32)
+        scores = embeddings @ np.asarray(query_embedding, dtype=np.float32)
+        best = sorted(np.argsort(-scores)[:max_sentences])
+        return " ".join(sentences[i] for i in best)
+    
+    def generate_answer(self, query: str, top_k: int = 3, use_cache: bool = True,
+                        query_embedding: Optional[np.ndarray] = None) -> Dict:
+        """Main RAG pipeline: Search + Generate answer
+        
+        The returned "path" records how the answer was produced: "cache"
+        (precomputed FAQ answer), "extractive" (high-confidence match, no LLM
+        call), "not_found" (below the floor), "llm", or "fallback" (LLM
+        unavailable, retrieval-only answer).
+        """
+        
+        # Step 0: Frequent questions are answered from the warm cache
+        faq_cache = self.faq_cache
+        if use_cache and faq_cache is not None and faq_cache.index_version == self.index_version:
+            cached = faq_cache.get(query, top_k)
+            if cached is not None:
+                return cached
         
         # Step 1: Retrieve relevant context
-        search_results = self.search(query, top_k=top_k)
+        if query_embedding is None:
+            query_embedding = self._embed(query)
+        search_results = self.search_with_scores(query, top_k=top_k, query_embedding=query_embedding)
+        confidence = search_results[0][2] if search_results else 0.0
         
-        if not search_results:
+        if not search_results or confidence < self.not_found_threshold:
             return {
                 "answer": "I don't have enough information to answer this question. Please add more data to the knowledge base.",
                 "sources": [],
-                "images": []
+                "images": [],
+                "path": "not_found",
+                "confidence": confidence
             }
         
         # Step 2: Prepare context
@@ -152,9 +335,9 @@ class CollegeRAGSystem:
         sources = []
         images = []
         
-        for doc, meta in search_results:
+        for doc, meta, score in search_results:
             context_parts.append(doc)
-            sources.append(meta)
+            sources.append(dict(meta))  # plain dicts for JSON, even from a MetadataStore
             
             # Collect images if any
             if meta.get('type') == 'image':
@@ -163,6 +346,16 @@ class CollegeRAGSystem:
                     'description': meta.get('description')
                 })
         
+        # Fast path: a confident lookup is answered straight from the best chunk
+        if confidence >= self.answer_threshold:
+            return {
+                "answer": self._extractive_answer(query_embedding, search_results[0][0]),
+                "sources": sources,
+                "images": images,
+                "path": "extractive",
+                "confidence": confidence
+            }
+        
         context = "\n\n".join(context_parts)
         
         # Step 3: Build prompt
@@ -184,51 +377,146 @@ Student question: {query}
 Answer the question based on the context above. Be helpful and concise."""
         
         # Step 4: Generate response using Groq
+        path = "llm"
+        gate = self.llm_gate() if self.llm_gate else nullcontext()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            
-            answer = response.choices[0].message.content
-            
-        except Exception as e:
-            answer = f"Error generating response: {str(e)}"
+            with gate:
+                answer = self.llm.chat(
+                    [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.3,
+                    max_tokens=500
+                )
+        except LLMUnavailableError:
+            # Upstream is down or too slow: answer from the retrieved text alone
+            answer = self._retrieval_only_answer(search_results)
+            path = "fallback"
         
         return {
             "answer": answer,
             "sources": sources,
-            "images": images
+            "images": images,
+            "path": path,
+            "confidence": confidence
         }
     
+    def _retrieval_only_answer(self, search_results: List[Tuple[str, Dict, float]], max_chars: int = 600) -> str:
+        """Fallback answer built from the best retrieved chunk when the LLM is unavailable"""
+        doc, meta = search_results[0][:2]
+        excerpt = doc if len(doc) <= max_chars else doc[:max_chars].rsplit(' ', 1)[0] + "..."
+        source = meta.get('title', meta.get('source', 'college database'))
+        return (
+            "The AI assistant is temporarily unavailable, but here is the most relevant "
+            f"information I found ({source}):\n\n{excerpt}"
+        )
+    
     def save(self, filename: str = "rag_system.pkl"):
         """Save the RAG system to disk"""
-        data = {
-            'documents': self.documents,
-            'metadata': self.metadata,
-            'index': faiss.serialize_index(self.index)
-        }
-        
-        with open(filename, 'wb') as f:
-            pickle.dump(data, f)
-        
-        print(f"✓ Saved RAG system to {filename}")
+        version = self.snapshot.to_file(filename, columnar_metadata=self.columnar_metadata,
+                                        chunk_store=self.chunk_store)
+        print(f"✓ Saved RAG system to {filename} (version {version})")
     
     def load(self, filename: str = "rag_system.pkl"):
         """Load a saved RAG system"""
-        with open(filename, 'rb') as f:
-            data = pickle.load(f)
-        
-        self.documents = data['documents']
-        self.metadata = data['metadata']
-        self.index = faiss.deserialize_index(data['index'])
-        
-        print(f"✓ Loaded RAG system from {filename}")
+        self.snapshot = self._open_snapshot(filename)
+        print(f"✓ Loaded RAG system from {filename} (version {self.index_version})")
+        self.load_thresholds(filename)
+    
+    def _open_snapshot(self, filename: str) -> IndexSnapshot:
+        snapshot = IndexSnapshot.from_file(filename, chunk_store=self.chunk_store,
+                                           columnar_metadata=self.columnar_metadata)
+        if self.use_shards:
+            snapshot.build_shards()
+        return snapshot
+    
+    def swap_snapshot(self, snapshot: IndexSnapshot):
+        """Publish a new snapshot; in-flight queries finish on the one they started with"""
+        with self._write_lock:
+            old = self.snapshot
+            self.snapshot = snapshot
+            track_release(old)
+            print(f"✓ Swapped index {old.version} -> {snapshot.version} ({len(snapshot)} chunks)")
+            for callback in self.on_swap:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"✗ Snapshot swap callback failed: {e}")
+    
+    def append_chunks(self, documents: List[str], metadata: List[Dict], embeddings: np.ndarray) -> IndexSnapshot:
+        """Make new chunks searchable by swapping in an extended copy of the live snapshot
+        
+        Writers are serialized so concurrent appends (and reloads) never drop
+        each other's chunks; readers are never blocked. A reload of an older
+        save is skipped, but a newly built file replaces unsaved appended chunks.
+        """
+        with self._write_lock:
+            snapshot = self.snapshot.extended(documents, metadata, embeddings)
+            if self.use_shards:
+                snapshot.build_shards()
+            self.swap_snapshot(snapshot)
+        return snapshot
+    
+    def reload(self, filename: str, background: bool = True) -> bool:
+        """Load an index file and swap it in without interrupting queries
+        
+        A file holding the live version, or one the live snapshot was extended
+        from (e.g. saved by an ingestion job before a later append), is not
+        swapped in, so appended chunks are never dropped. The check and swap
+        happen under the write lock, so no append can slip in between.
+        Returns False if a reload is already running.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        
+        def run():
+            try:
+                self.reloading = True
+                snapshot = self._open_snapshot(filename)
+                with self._write_lock:
+                    live = self.snapshot
+                    if snapshot.version == live.version:
+                        print(f"Index {filename} unchanged (version {snapshot.version})")
+                    elif live.appended_since(snapshot.version) is not None:
+                        print(f"Index {filename} (version {snapshot.version}) is older than the live "
+                              f"version {live.version}, which has chunks appended since; not swapped in")
+                    else:
+                        self.swap_snapshot(snapshot)
+                        self.load_thresholds(filename)
+            except Exception as e:
+                print(f"✗ Reload of {filename} failed, keeping version {self.index_version}: {e}")
+            finally:
+                self.reloading = False
+                self._reload_lock.release()
+        
+        if background:
+            threading.Thread(target=run, daemon=True).start()
+        else:
+            run()
+        return True
+
+
+def thresholds_path(index_file: str) -> str:
+    """Calibrated thresholds live next to the index: college_rag_complete.thresholds.json"""
+    return os.path.splitext(index_file)[0] + ".thresholds.json"
+
+
+def _split_sentences(text: str, max_words: int = 40) -> List[str]:
+    """Split a chunk into sentences; run-on text (tables, bullet lists) is cut into word windows"""
+    sentences = []
+    carry = ''
+    for part in re.split(r'(?<=[.!?])\s+|\s+(?=- )|\n+', text):
+        words = (carry + ' ' + part).split()
+        if len(words) < 3:
+            carry = ' '.join(words)  # list numbering like "2." joins the next sentence
+            continue
+        carry = ''
+        for i in range(0, len(words), max_words):
+            sentences.append(' '.join(words[i:i + max_words]))
+    if carry:
+        sentences.append(carry)
+    return sentences
 
 
 # ==================== USAGE EXAMPLE ====================
@@ -0,0 +1,265 @@
+"""Embedding backends for CollegeRAGSystem.
+
+Every backend turns text into unit-length float32 vectors of the same model
+(all-MiniLM-L6-v2), so indexes built with one can be searched with another:
+
+- "torch": SentenceTransformer in eager PyTorch (the original behaviour);
+- "onnx": the same network exported to ONNX and run with ONNX Runtime;
+- "onnx-int8": the ONNX export with dynamic int8 weight quantization.
+
+The ONNX backends only need onnxruntime, tokenizers and NumPy at serving
+time, so torch is never imported (pip install onnxruntime; exporting also
+needs onnx). Export once from the locally cached model:
+
+    python embeddings.py export --output onnx_model
+    python embeddings.py check --model-dir onnx_model
+
+Then set EMBEDDING_BACKEND=onnx-int8 (and ONNX_MODEL_DIR) for app.py.
+"""
+import argparse
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_ONNX_DIR = "onnx_model"
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 truncates inputs at 256 tokens
+
+Texts = Union[str, Sequence[str]]
+
+
+class EmbeddingBackend(ABC):
+    """Interface: encode text(s) to L2-normalized float32 embeddings"""
+
+    name = "base"
+    dim = 384
+
+    def encode(self, texts: Texts, batch_size: int = 32) -> np.ndarray:
+        """1-D vector for a single string, 2-D array (n, dim) for a list"""
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.empty((0, self.dim), dtype=np.float32)
+        parts = [self._encode_batch(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)]
+        vectors = np.vstack(parts).astype(np.float32, copy=False)
+        return vectors[0] if single else vectors
+
+    @abstractmethod
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) unit vectors for one batch"""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Eager PyTorch SentenceTransformer"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, num_threads: Optional[int] = None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True,
+                                 convert_to_numpy=True)
+
+
+class ONNXBackend(EmbeddingBackend):
+    """ONNX Runtime session over an exported transformer, with mean pooling"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = DEFAULT_ONNX_DIR, quantized: bool = False,
+                 num_threads: Optional[int] = None, max_length: int = MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found; run `python embeddings.py export --output {model_dir}` first"
+            )
+        self.name = "onnx-int8" if quantized else "onnx"
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.enable_cpu_mem_arena = False  # the arena keeps peak batch buffers resident
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1] or self.dim
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        # Mean pooling over real tokens, then L2 normalization (as in the SentenceTransformer)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+def load_backend(name: Optional[str] = None, model_dir: Optional[str] = None,
+                 num_threads: Optional[int] = None, model_name: Optional[str] = None) -> EmbeddingBackend:
+    """Backend by name
+
+    Defaults come from EMBEDDING_BACKEND, ONNX_MODEL_DIR, EMBEDDING_THREADS and
+    EMBEDDING_MODEL (the SentenceTransformer name or path for "torch").
+    """
+    name = name or os.getenv("EMBEDDING_BACKEND", "torch")
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+    model_dir = model_dir or os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+    if num_threads is None and os.getenv("EMBEDDING_THREADS"):
+        num_threads = int(os.getenv("EMBEDDING_THREADS"))
+
+    if name == "torch":
+        return SentenceTransformerBackend(model_name, num_threads=num_threads)
+    if name in ("onnx", "onnx-int8"):
+        return ONNXBackend(model_dir, quantized=name == "onnx-int8", num_threads=num_threads)
+    raise ValueError(f"Unknown embedding backend: {name} (expected torch, onnx or onnx-int8)")
+
+
+def export_onnx(model_name: str = DEFAULT_MODEL, output_dir: str = DEFAULT_ONNX_DIR,
+                quantize: bool = True, opset: int = 17) -> str:
+    """Export the (locally cached) SentenceTransformer's transformer to ONNX
+
+    Set HF_HUB_OFFLINE=1 to guarantee nothing is downloaded.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["export sample text", "a second, longer export sample"],
+                       padding=True, return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    model_path = os.path.join(output_dir, ONNX_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            model_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                          "last_hidden_state": axes},
+            opset_version=opset,
+            dynamo=False,
+        )
+    tokenizer.save_pretrained(output_dir)  # writes tokenizer.json for the fast tokenizer
+    print(f"✓ Exported {model_name} to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, ONNX_INT8_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"✓ Quantized to {quantized_path}")
+    return model_path
+
+
+def check_equivalence(reference: EmbeddingBackend, candidate: EmbeddingBackend,
+                      texts: Sequence[str], min_cosine: float = 0.99, top_k: int = 3) -> Dict:
+    """Compare two backends on the same texts
+
+    Reports per-text cosine similarity between their embeddings and how often
+    top-k neighbours (each text against all others) agree.
+    """
+    texts = list(texts)
+    a = reference.encode(texts)
+    b = candidate.encode(texts)
+    cosines = np.sum(a * b, axis=1)
+
+    k = min(top_k, len(texts) - 1)
+    overlap = 1.0
+    if k > 0:
+        def neighbours(vectors):
+            scores = vectors @ vectors.T
+            np.fill_diagonal(scores, -np.inf)
+            return np.argsort(-scores, axis=1)[:, :k]
+
+        na, nb = neighbours(a), neighbours(b)
+        overlap = float(np.mean([len(set(x) & set(y)) / k for x, y in zip(na, nb)]))
+
+    return {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "texts": len(texts),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        f"top{k}_overlap": overlap,
+        "passed": bool(cosines.min() >= min_cosine),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and verify ONNX embedding backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export the cached model to ONNX (+ int8)")
+    export.add_argument("--model", default=DEFAULT_MODEL)
+    export.add_argument("--output", default=DEFAULT_ONNX_DIR)
+    export.add_argument("--no-quantize", action="store_true")
+
+    check = sub.add_parser("check", help="compare ONNX backends with the PyTorch one")
+    check.add_argument("--model-dir", default=DEFAULT_ONNX_DIR)
+    check.add_argument("--index", default="college_rag_complete.pkl",
+                       help="chunk texts to compare on (saved RAG pickle)")
+    check.add_argument("--samples", type=int, default=200)
+    check.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.output, quantize=not args.no_quantize)
+        return
+
+    from index_snapshot import IndexSnapshot
+
+    texts = IndexSnapshot.from_file(args.index).documents[:args.samples]
+    reference = load_backend("torch")
+    failed = False
+    for name in ("onnx", "onnx-int8"):
+        try:
+            candidate = load_backend(name, args.model_dir)
+        except FileNotFoundError as e:
+            print(f"✗ {name}: {e}")
+            continue
+        report = check_equivalence(reference, candidate, texts, args.min_cosine)
+        failed |= not report["passed"]
+        print(("✓ " if report["passed"] else "✗ ") + ", ".join(f"{k}={v}" for k, v in report.items()))
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""Retrieval quality vs latency over the golden question set.
+
+Runs retrieval only (no LLM) for every combination of chunk size, FAISS
+index type and top_k, and reports recall@k, MRR and nDCG@k next to search
+latency and index memory. "recall vs flat" is the share of the exact (flat)
+top-k neighbours an index returns; for "routed" (sharding.ShardedIndex over
+per-family flat shards) the share of vectors scanned per query is reported
+too, and how many chunks routing their own vector fails to find.
+Configurations that no other configuration beats on quality, latency and
+memory at once are marked as the Pareto front.
+
+    python evaluate_retrieval.py --chunk-sizes saved 200 500 --index-types flat hnsw ivf pq
+    python evaluate_retrieval.py --save-baseline eval_baseline.json
+    python evaluate_retrieval.py --baseline eval_baseline.json   # exits 1 on regression
+
+"saved" evaluates the chunks and vectors of --index-file as they are;
+numeric chunk sizes re-chunk college_data the way add_all_data.py and
+add_pdfs.py do. Relevance is judged per golden target (source file, and
+page when listed), so the metrics stay comparable across chunk sizes. The
+saved index stores whole PDFs without page numbers (add_pdfs_ocr.py); its
+chunks match page targets on the source alone, which the report flags.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+import PyPDF2
+
+from college_rag import CollegeRAGSystem
+from embeddings import load_backend
+from index_snapshot import IndexSnapshot
+from sharding import ShardedIndex
+
+DEFAULT_GOLDEN = "golden_questions.json"
+DATA_DIR = "college_data"
+INDEX_TYPES = ["flat", "hnsw", "ivf", "pq", "routed"]
+QUALITY_METRICS = ("recall", "mrr", "ndcg")
+
+
+def load_golden(path: str) -> Dict:
+    with open(path, "rb") as f:
+        raw = f.read()
+    golden = json.loads(raw)
+    golden["sha1"] = hashlib.sha1(raw).hexdigest()[:12]
+    return golden
+
+
+# --- Corpus ---
+def extract_units(data_dir: str, cache_path: Optional[str] = None) -> List[Tuple[str, Dict]]:
+    """(text, metadata) per text file and per PDF page, before chunking
+
+    PDF extraction is slow, so pages are cached by file name, size and mtime.
+    """
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+
+    units, changed = [], False
+    text_dir = os.path.join(data_dir, "text")
+    for filename in sorted(os.listdir(text_dir)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(text_dir, filename), encoding="utf-8") as f:
+                units.append((f.read(), {"source": filename, "type": "text"}))
+
+    pdf_dir = os.path.join(data_dir, "pdfs")
+    for filename in sorted(os.listdir(pdf_dir)):
+        if not filename.endswith(".pdf"):
+            continue
+        path = os.path.join(pdf_dir, filename)
+        stat = os.stat(path)
+        key = f"{filename}:{stat.st_size}:{int(stat.st_mtime)}"
+        if key not in cache:
+            try:
+                cache[key] = [page.extract_text() or "" for page in PyPDF2.PdfReader(path).pages]
+            except Exception as e:
+                print(f"✗ Error processing {filename}: {e}")
+                cache[key] = []
+            changed = True
+        for page_num, text in enumerate(cache[key]):
+            if text.strip():
+                units.append((text, {"source": filename, "type": "pdf_document", "page": page_num + 1}))
+
+    if cache_path and changed:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    return units
+
+
+def chunk_units(units: List[Tuple[str, Dict]], chunk_size: int, overlap: int) -> Tuple[List[str], List[Dict]]:
+    """Chunk like CollegeRAGSystem.add_text/add_pdf, skipping chunks of 50 characters or less"""
+    documents, metadata = [], []
+    for text, meta in units:
+        for chunk_idx, chunk in enumerate(CollegeRAGSystem._chunk_text(text, chunk_size, overlap)):
+            if len(chunk.strip()) > 50:
+                documents.append(chunk)
+                metadata.append(dict(meta, chunk=chunk_idx))
+    return documents, metadata
+
+
+def corpus_fingerprint(data_dir: str) -> str:
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(data_dir)):
+        for filename in sorted(files):
+            digest.update(f"{filename}:{os.path.getsize(os.path.join(root, filename))}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+# --- Indexes ---
+def build_index(kind: str, vectors: np.ndarray, hnsw_m: int = 32, ef_search: int = 64,
+                nprobe: int = 8, pq_m: int = 48, metadata: Optional[Sequence[Dict]] = None):
+    """FAISS index of the given kind over unit vectors (L2, as CollegeRAGSystem uses)
+
+    "routed" needs the chunk metadata, which decides each chunk's shard.
+    """
+    n, dim = vectors.shape
+    if kind == "routed":
+        flat = faiss.IndexFlatL2(dim)
+        flat.add(vectors)
+        return ShardedIndex.build(flat, metadata)
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efSearch = ef_search
+    elif kind == "ivf":
+        nlist = max(1, int(np.sqrt(n)))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.nprobe = min(nprobe, nlist)
+    elif kind == "pq":
+        nbits = max(1, min(8, int(np.log2(n))))  # k-means needs at least 2**nbits points
+        index = faiss.IndexPQ(dim, pq_m, nbits)
+        index.pq.cp.min_points_per_centroid = 1  # small corpora are expected; skip the warning
+    else:
+        raise ValueError(f"Unknown index type: {kind} (expected one of {', '.join(INDEX_TYPES)})")
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def index_bytes(index) -> int:
+    """Serialized size, a close proxy for the index's resident memory"""
+    if isinstance(index, ShardedIndex):
+        return sum(index_bytes(shard.index) + shard.ids.nbytes for shard in index.shards.values())
+    return int(faiss.serialize_index(index).nbytes)
+
+
+# --- Metrics ---
+def target_hit(meta: Dict, target: Dict) -> bool:
+    """Chunk covers a golden target
+
+    Chunks without a page number (PDFs indexed as one text, as add_pdfs_ocr.py
+    does) match page-specific targets on the source alone.
+    """
+    if meta.get("source") != target["source"]:
+        return False
+    pages = target.get("pages")
+    return not pages or meta.get("page") is None or meta.get("page") in pages
+
+
+def reachability(metadata: Sequence, golden: Dict) -> Dict[str, List[str]]:
+    """Question ids whose targets the chunks can only match by source, or not at all"""
+    paged, pageless = set(), set()
+    for meta in metadata:
+        (pageless if meta.get("page") is None else paged).add(meta.get("source"))
+    source_only, unreachable = [], []
+    for item in golden["questions"]:
+        targets = item["relevant"]
+        if not any(t["source"] in paged or t["source"] in pageless for t in targets):
+            unreachable.append(item["id"])
+        elif any(t.get("pages") and t["source"] in pageless for t in targets):
+            source_only.append(item["id"])
+    return {"source_only": source_only, "unreachable": unreachable}
+
+
+def score_ranking(ranked: Sequence[Dict], targets: List[Dict], k: int) -> Dict[str, float]:
+    """recall@k, reciprocal rank, nDCG@k and hit@k for one query
+
+    A chunk gains 1 the first time it covers a not yet retrieved target;
+    further chunks of an already found target gain nothing.
+    """
+    found, gains, first = set(), [], None
+    for rank, meta in enumerate(ranked[:k], 1):
+        new = [i for i, target in enumerate(targets) if i not in found and target_hit(meta, target)]
+        if new and first is None:
+            first = rank
+        found.update(new)
+        gains.append(1.0 if new else 0.0)
+    dcg = sum(g / np.log2(rank + 1) for rank, g in enumerate(gains, 1))
+    ideal = sum(1.0 / np.log2(rank + 1) for rank in range(1, min(k, len(targets)) + 1))
+    return {
+        "recall": len(found) / len(targets),
+        "mrr": 1.0 / first if first else 0.0,
+        "ndcg": float(dcg / ideal) if ideal else 0.0,
+        "hit": 1.0 if found else 0.0,
+    }
+
+
+def evaluate_index(index, metadata: Sequence, query_vectors: np.ndarray, golden: Dict, top_k: int,
+                   exact_ids: np.ndarray) -> Dict:
+    """Quality metrics and per-query search latency for one index at one top_k
+
+    exact_ids holds each query's flat (exact) neighbours, best first.
+    """
+    routed = isinstance(index, ShardedIndex)
+    total = index.total if routed else index.ntotal
+    k = min(top_k, total)
+    scores, overlaps, latencies = [], [], []
+    if routed:
+        index.stats.update(queries=0, vectors_scanned=0)
+    for vector, item, exact in zip(query_vectors, golden["questions"], exact_ids):
+        start = time.perf_counter()
+        if routed:
+            _, indices = index.search(item["question"], vector, k)
+        else:
+            _, indices = index.search(vector[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = [i for i in indices[0] if i >= 0]
+        ranked = [metadata[i] for i in found]
+        scores.append(score_ranking(ranked, item["relevant"], top_k))
+        overlaps.append(len(set(found) & set(exact[:k])) / k if k else 1.0)
+    row = {name: float(np.mean([s[name] for s in scores])) for name in ("recall", "mrr", "ndcg", "hit")}
+    row["recall_vs_flat"] = float(np.mean(overlaps))
+    row["fraction_scanned"] = index.info()["avg_fraction_scanned"] if routed else None
+    row["search_p50_ms"] = float(np.percentile(latencies, 50))
+    row["search_p95_ms"] = float(np.percentile(latencies, 95))
+    return row
+
+
+def mark_pareto(rows: List[Dict], metric: str):
+    """Flag rows not dominated on (metric up, p50 latency down, index memory down), per top_k"""
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row and other["top_k"] == row["top_k"]
+            and other[metric] >= row[metric]
+            and other["search_p50_ms"] <= row["search_p50_ms"]
+            and other["index_bytes"] <= row["index_bytes"]
+            and (other[metric] > row[metric] or other["search_p50_ms"] < row["search_p50_ms"]
+                 or other["index_bytes"] < row["index_bytes"])
+            for other in rows
+        )
+
+
+def config_key(row: Dict) -> str:
+    return f"{row['chunk_size']}/{row['index']}/k{row['top_k']}"
+
+
+def find_regressions(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Quality drops larger than tolerance against a saved report"""
+    if baseline.get("golden_version") != report["golden_version"]:
+        print(f"⚠ Baseline used golden set v{baseline.get('golden_version')}, "
+              f"this run v{report['golden_version']}; comparing anyway")
+    previous = {config_key(row): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in report["results"]:
+        old = previous.get(config_key(row))
+        if old is None:
+            continue
+        for metric in QUALITY_METRICS:
+            if row[metric] < old[metric] - tolerance:
+                regressions.append(f"{config_key(row)} {metric}: {old[metric]:.3f} -> {row[metric]:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency on the golden set")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--index-file", default="college_rag_complete.pkl", help="used by the 'saved' chunk size")
+    parser.add_argument("--chunk-sizes", nargs="+", default=["saved", "200", "500"],
+                        help="words per chunk, or 'saved' for the chunks of --index-file")
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--index-types", nargs="+", default=INDEX_TYPES, choices=INDEX_TYPES)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers (must divide 384)")
+    parser.add_argument("--pareto-metric", choices=QUALITY_METRICS, default="ndcg")
+    parser.add_argument("--embedding-backend", default=None, help="torch, onnx or onnx-int8 (default: env)")
+    parser.add_argument("--pages-cache", default=".eval_pages_cache.json")
+    parser.add_argument("--output", default="retrieval_eval.json")
+    parser.add_argument("--baseline", help="report to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--save-baseline", help="also write this run's report here")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    backend = load_backend(args.embedding_backend)
+    query_vectors = backend.encode([q["question"] for q in golden["questions"]]).astype(np.float32)
+    units = None
+    rows = []
+    coverage = {}
+
+    for chunk_size in args.chunk_sizes:
+        if chunk_size == "saved":
+            saved = IndexSnapshot.from_file(args.index_file)
+            metadata = saved.metadata
+            vectors = saved.index.reconstruct_n(0, saved.index.ntotal)
+        else:
+            if units is None:
+                print(f"Extracting {args.data_dir}...")
+                units = extract_units(args.data_dir, args.pages_cache)
+            documents, metadata = chunk_units(units, int(chunk_size), args.overlap)
+            print(f"Embedding {len(documents)} chunks of {chunk_size} words...")
+            vectors = backend.encode(documents, batch_size=64).astype(np.float32)
+
+        coverage[chunk_size] = reachability(metadata, golden)
+        _, exact_ids = build_index("flat", vectors).search(query_vectors, min(max(args.top_k), len(vectors)))
+        for kind in args.index_types:
+            start = time.perf_counter()
+            index = build_index(kind, vectors, args.hnsw_m, args.ef_search, args.nprobe, args.pq_m, metadata)
+            build_seconds = time.perf_counter() - start
+            size = index_bytes(index)
+            self_misses = None
+            if kind == "routed":
+                self_misses = len(index.self_query_misses())
+                print(f"{'⚠' if self_misses else '✓'} {chunk_size}: {self_misses} of {index.total} chunks "
+                      f"not found when routing their own vector")
+            for top_k in args.top_k:
+                row = {"chunk_size": chunk_size, "index": kind, "top_k": top_k, "chunks": len(vectors)}
+                row.update(evaluate_index(index, metadata, query_vectors, golden, top_k, exact_ids))
+                row.update(index_bytes=size, build_s=build_seconds, self_query_misses=self_misses)
+                rows.append(row)
+
+    mark_pareto(rows, args.pareto_metric)
+    report = {
+        "golden_version": golden["version"],
+        "golden_sha1": golden["sha1"],
+        "questions": len(golden["questions"]),
+        "corpus": corpus_fingerprint(args.data_dir),
+        "embedding_backend": backend.name,
+        "pareto_metric": args.pareto_metric,
+        "coverage": coverage,
+        "results": rows,
+    }
+
+    print(f"\n{len(golden['questions'])} questions, golden set v{golden['version']}, "
+          f"embeddings: {backend.name}\n")
+    for chunk_size, found in coverage.items():
+        if found["source_only"]:
+            print(f"⚠ {chunk_size}: chunks have no page numbers; {len(found['source_only'])} questions' "
+                  f"page targets match on source only ({', '.join(found['source_only'])})")
+        if found["unreachable"]:
+            print(f"⚠ {chunk_size}: no chunk from any target source for {', '.join(found['unreachable'])}")
+    print(f"{'chunks':>7}{'index':>7}{'k':>4}{'recall':>8}{'MRR':>7}{'nDCG':>7}{'hit':>7}{'vs flat':>8}"
+          f"{'scanned':>8}{'p50 ms':>9}{'p95 ms':>9}{'index KB':>10}  pareto")
+    for r in rows:
+        scanned = f"{r['fraction_scanned']:>8.2f}" if r["fraction_scanned"] is not None else f"{'-':>8}"
+        print(f"{r['chunk_size']:>7}{r['index']:>7}{r['top_k']:>4}{r['recall']:>8.3f}{r['mrr']:>7.3f}"
+              f"{r['ndcg']:>7.3f}{r['hit']:>7.3f}{r['recall_vs_flat']:>8.3f}{scanned}"
+              f"{r['search_p50_ms']:>9.3f}{r['search_p95_ms']:>9.3f}"
+              f"{r['index_bytes'] / 1024:>10.0f}  {'*' if r['pareto'] else ''}")
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"✗ {len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  - {line}")
+            raise SystemExit(1)
+        print(f"✓ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Local fake of the Groq chat completions endpoint.
+
+Used to exercise the LLM client and the HTTP API without network access.
+Latency, token rate and error injection are configurable and can be changed
+while the server is running.
+
+    python fake_llm_server.py --port 8001 --latency 0.4 --error-rate 0.05
+
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:8001
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class FakeLLMServer:
+    """Threaded fake LLM server with injectable latency and failures."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        token_rate: Optional[float] = None,
+        completion_tokens: int = 60,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 30.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            port: 0 picks a free port; read it back from `base_url`.
+            latency: Fixed time before the first byte of every response.
+            jitter: Extra uniformly random latency in [0, jitter].
+            token_rate: If set, add completion_tokens / token_rate seconds to
+                simulate generation speed.
+            error_rate: Fraction of requests answered with `error_status`.
+            stall_rate: Fraction of requests that hang for `stall_seconds`.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+        self.requests_served = 0
+        self._forced_failures = []
+        self._forced_stalls = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()  # wakes stalled handlers on stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, count: int = 1, status: Optional[int] = None):
+        """Force the next `count` requests to fail with `status`."""
+        with self._lock:
+            self._forced_failures.extend([status or self.error_status] * count)
+
+    def stall_next(self, count: int = 1):
+        """Force the next `count` requests to hang for `stall_seconds`."""
+        with self._lock:
+            self._forced_stalls += count
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Request handling ---
+    def _plan(self):
+        """Decide (delay, error_status) for one request."""
+        with self._lock:
+            self.requests_served += 1
+            forced = self._forced_failures.pop(0) if self._forced_failures else None
+            stall = self._forced_stalls > 0 and forced is None
+            if stall:
+                self._forced_stalls -= 1
+            roll = self._random.random()
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+
+        delay = self.latency + extra
+        if self.token_rate:
+            delay += self.completion_tokens / self.token_rate
+        if forced is not None:
+            return delay, forced
+        if stall or roll < self.stall_rate:
+            return self.stall_seconds, None
+        if roll < self.stall_rate + self.error_rate:
+            return delay, self.error_status
+        return delay, None
+
+    def _completion(self, request: dict) -> dict:
+        question = ""
+        for message in request.get("messages", []):
+            if message.get("role") == "user":
+                question = message.get("content", "")
+        words = max(self.completion_tokens, 1)
+        content = ("This is a fake answer. " * words)[: words * 6].strip()
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(question.split()),
+                "completion_tokens": words,
+                "total_tokens": len(question.split()) + words,
+            },
+        }
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is exercised
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b"{}"
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+
+                delay, error_status = fake._plan()
+                if fake._stopped.wait(delay):
+                    self.close_connection = True
+                    return
+                if error_status is not None:
+                    headers = {"Retry-After": "0"} if error_status == 429 else {}
+                    self._send(error_status, {"error": {"message": "injected failure"}}, headers)
+                    return
+                self._send(200, fake._completion(json.loads(body or b"{}")))
+
+            def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for key, value in (headers or {}).items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up (timeout or losing hedge)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=None)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        token_rate=args.token_rate,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stall_rate=args.stall_rate,
+        seed=args.seed,
+    )
+    print(f"✓ Fake LLM server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
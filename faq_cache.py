@@ -0,0 +1,372 @@
+"""Warm cache of precomputed answers for frequently asked questions.
+
+A small set of questions dominates traffic. This job precomputes the query
+embedding, retrieval results and answer for a configurable question list plus
+the most frequent questions in the query log, and tags the cache with the
+index version it was built against. The server loads it at startup and
+answers those questions with a dictionary lookup.
+
+When an index only had chunks appended (live ingestion), answers whose
+top-k retrieval the new chunks cannot change are carried over to the new
+version and only the others are rebuilt. Otherwise, re-run after every index
+rebuild (a cache for another version is ignored):
+
+    python faq_cache.py --index college_rag_complete.pkl --log query_log.jsonl
+"""
+import argparse
+import json
+import os
+import pickle
+import queue
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Quick questions offered in the Streamlit sidebar, plus other common lookups
+DEFAULT_FAQ_QUESTIONS = [
+    "What are hostel mess timings?",
+    "What is the annual fee?",
+    "What sports facilities are available?",
+    "What is the hostel fee?",
+    "What are the hostel timings?",
+    "What is the list of holidays?",
+    "What is the academic calendar?",
+    "Who is the director of IIIT Nagpur?",
+    "What programs are offered at IIIT Nagpur?",
+    "What are the placement and training facilities?",
+]
+
+
+def normalize_question(question: str) -> str:
+    """Cache key: lower case, punctuation dropped, whitespace collapsed"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def _log_tail(log_path: str, max_bytes: int) -> List[str]:
+    """Lines in the last max_bytes of a query log, reaching into the rotated log if needed"""
+    parts = []
+    for path in (log_path, log_path + ".1"):
+        if max_bytes <= 0 or not os.path.exists(path):
+            break
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            start = max(0, size - max_bytes)
+            f.seek(start)
+            data = f.read()
+        if start:
+            data = data.partition(b"\n")[2]  # drop the partial first line
+        parts.insert(0, data)
+        max_bytes -= size
+    return b"".join(parts).decode("utf-8", errors="replace").splitlines()
+
+
+def top_logged_questions(log_path: str, n: int = 20, max_bytes: int = 1 << 20) -> List[str]:
+    """Most frequent of the recent questions in a JSON-lines query log, most common first
+
+    Only the last max_bytes of the log are read, so a warm-up costs the same
+    however long the server has been logging.
+    """
+    if not log_path or not os.path.exists(log_path):
+        return []
+
+    counts = Counter()
+    original = {}
+    for line in _log_tail(log_path, max_bytes):
+        try:
+            question = json.loads(line).get("question", "")
+        except json.JSONDecodeError:
+            continue
+        key = normalize_question(question)
+        if key:
+            counts[key] += 1
+            original.setdefault(key, question.strip())
+    return [original[key] for key, _ in counts.most_common(n)]
+
+
+class QueryLog:
+    """JSON-lines query log written by a background thread
+
+    record() only puts the line on a bounded queue, so a request never waits
+    on the file (lines are dropped and counted while the queue is full). The
+    log is rotated to <path>.1 once it passes max_bytes, so at most about
+    twice that is kept on disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 5 << 20, max_pending: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue: "queue.Queue[str]" = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+        self._thread.start()
+
+    def record(self, question: str, path: Optional[str]):
+        """Queue one line for the log (returns immediately)"""
+        line = json.dumps({"ts": time.time(), "question": question, "path": path})
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until every recorded line is written"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    size = f.tell()
+                if size >= self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError as e:
+                print(f"✗ Could not write the query log {self.path}: {e}")
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+
+class FAQCache:
+    """Precomputed responses keyed by normalized question, for one index version"""
+
+    def __init__(self, index_version: str, top_k: int = 3, entries: Optional[Dict] = None):
+        self.index_version = index_version
+        self.top_k = top_k
+        self.entries = entries or {}
+        self.stale: Dict[str, Dict] = {}  # entries dropped by carried_forward, still to rebuild
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, question: str, top_k: int = 3) -> Optional[Dict]:
+        """Cached response for a question, or None"""
+        if top_k != self.top_k:
+            return None
+        entry = self.entries.get(normalize_question(question))
+        if entry is None:
+            return None
+        return dict(entry["response"], path="cache")
+
+    @classmethod
+    def build(cls, rag, questions: List[str], top_k: int = 3,
+              previous: Optional["FAQCache"] = None) -> "FAQCache":
+        """Answer each question through the full pipeline and keep the results
+
+        Query embeddings from a previous cache are reused, since they do not
+        depend on the index.
+        """
+        cache = cls(rag.index_version, top_k)
+        for question in questions:
+            key = normalize_question(question)
+            if not key or key in cache.entries:
+                continue
+
+            embedding = None
+            if previous is not None and key in previous.entries:
+                embedding = previous.entries[key]["embedding"]
+            if embedding is None:
+                embedding = rag._embed(question)
+
+            try:
+                results = [
+                    (doc, dict(meta), score)
+                    for doc, meta, score in rag.search_with_scores(question, top_k=top_k, query_embedding=embedding)
+                ]
+                response = rag.generate_answer(question, top_k=top_k, use_cache=False,
+                                               query_embedding=embedding)
+            except Exception as e:
+                print(f"  ✗ Skipped ({e}): {question}")
+                continue
+            if response.get("path") == "fallback":
+                print(f"  ✗ Skipped (LLM unavailable): {question}")
+                continue
+
+            cache.entries[key] = {
+                "question": question,
+                "embedding": embedding,
+                "results": results,
+                "response": response,
+            }
+            print(f"  ✓ {question} [{response.get('path')}]")
+        return cache
+
+    def carried_forward(self, snapshot) -> Optional["FAQCache"]:
+        """This cache moved to a snapshot that only appended chunks to its index
+
+        An entry stays valid unless an appended chunk scores above its k-th
+        result (so it would enter the top_k); those entries move to `stale`.
+        Returns None if the snapshot does not extend this cache's version.
+        """
+        start = snapshot.appended_since(self.index_version)
+        if start is None:
+            return None
+        if snapshot.version == self.index_version:
+            return self
+
+        cache = FAQCache(snapshot.version, self.top_k)
+        cache.stale = dict(self.stale)
+        added = snapshot.index.ntotal - start
+        vectors = snapshot.index.reconstruct_n(start, added) if added else None
+        for key, entry in self.entries.items():
+            results = entry["results"]
+            if vectors is not None:
+                best_new = float(np.max(vectors @ np.asarray(entry["embedding"], dtype=np.float32)))
+                if len(results) < self.top_k or best_new > results[-1][2]:
+                    cache.stale[key] = entry
+                    continue
+            cache.entries[key] = entry
+        return cache
+
+    def save(self, filename: str = "faq_cache.pkl"):
+        # A unique temporary file in the same directory, so concurrent savers never mix writes
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                   dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(self, f)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        print(f"✓ Saved FAQ cache with {len(self)} answers to {filename}")
+
+    @classmethod
+    def load(cls, filename: str = "faq_cache.pkl",
+             index_version: Optional[str] = None) -> Optional["FAQCache"]:
+        """Load a cache; returns None if missing or built for another index version"""
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename, "rb") as f:
+                cache = pickle.load(f)
+        except Exception as e:
+            print(f"✗ Could not load FAQ cache {filename}: {e}")
+            return None
+        cache.__dict__.setdefault("stale", {})  # caches saved before carried_forward existed
+        if index_version is not None and cache.index_version != index_version:
+            print(f"FAQ cache {filename} is for index {cache.index_version}, not {index_version}; ignoring")
+            return None
+        print(f"✓ Loaded FAQ cache with {len(cache)} answers from {filename}")
+        return cache
+
+
+def warm(rag, filename: str = "faq_cache.pkl", questions: Optional[List[str]] = None,
+         log_path: Optional[str] = None, top_n: int = 20, force: bool = False) -> FAQCache:
+    """Rebuild the FAQ cache if the index version changed, then attach it to rag"""
+    current = FAQCache.load(filename, rag.index_version)
+    if current is None and not force and rag.faq_cache is not None:
+        current = rag.faq_cache.carried_forward(rag.snapshot)
+    if current is not None and not force:
+        if current.stale:
+            current = refresh_stale(rag, current)
+            if current.index_version != rag.index_version:
+                return current
+            current.save(filename)
+        rag.faq_cache = current
+        return current
+
+    questions = list(questions if questions is not None else DEFAULT_FAQ_QUESTIONS)
+    questions += top_logged_questions(log_path, top_n)
+
+    print(f"Warming FAQ cache for index {rag.index_version} ({len(questions)} questions)...")
+    previous = FAQCache.load(filename)
+    cache = FAQCache.build(rag, questions, previous=previous)
+    if cache.index_version != rag.index_version:
+        # The index was swapped during the build; the answers may mix both versions
+        print(f"✗ FAQ cache for index {cache.index_version} is stale (now {rag.index_version}); discarded")
+        return cache
+    cache.save(filename)
+    rag.faq_cache = cache
+    return cache
+
+
+def refresh_stale(rag, cache: FAQCache) -> FAQCache:
+    """Rebuild the entries carried_forward marked stale; the others are kept as they are"""
+    print(f"Refreshing {len(cache.stale)} of {len(cache) + len(cache.stale)} FAQ answers "
+          f"for index {rag.index_version} (chunks were appended)...")
+    previous = FAQCache(cache.index_version, cache.top_k, entries=cache.stale)
+    rebuilt = FAQCache.build(rag, [entry["question"] for entry in cache.stale.values()],
+                             cache.top_k, previous=previous)
+    if rebuilt.index_version != rag.index_version or cache.index_version != rag.index_version:
+        print(f"✗ FAQ refresh for index {rebuilt.index_version} is stale (now {rag.index_version}); discarded")
+        return rebuilt
+    return FAQCache(cache.index_version, cache.top_k, entries=dict(cache.entries, **rebuilt.entries))
+
+
+class FAQWarmer:
+    """Single background worker that runs warm() on request
+
+    Requests that arrive while a build is running are coalesced into one
+    rebuild for whatever index version is live when it starts, so builds
+    never overlap and an older build cannot replace a newer cache.
+    """
+
+    def __init__(self, rag, filename: str = "faq_cache.pkl", questions: Optional[List[str]] = None,
+                 log_path: Optional[str] = None, top_n: int = 20, delay: float = 0.0):
+        """
+        Args:
+            delay: Wait this long after a request before building, so a burst
+                of swaps (e.g. several uploads) costs a single build.
+        """
+        self.rag = rag
+        self.filename = filename
+        self.questions = questions
+        self.log_path = log_path
+        self.top_n = top_n
+        self.delay = delay
+        self._requested = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="faq-warmer", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        """Ask for the cache to match the live index version (returns immediately)"""
+        self._requested.set()
+
+    def _run(self):
+        while True:
+            self._requested.wait()
+            time.sleep(self.delay)
+            self._requested.clear()
+            try:
+                warm(self.rag, self.filename, self.questions, self.log_path, self.top_n)
+            except Exception as e:
+                print(f"✗ FAQ cache warm-up failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for frequent questions")
+    parser.add_argument("--index", default="college_rag_complete.pkl")
+    parser.add_argument("--output", default="faq_cache.pkl")
+    parser.add_argument("--log", default="query_log.jsonl", help="JSON-lines query log")
+    parser.add_argument("--top-n", type=int, default=20, help="questions taken from the log")
+    parser.add_argument("--questions", help="file with one extra question per line")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the version matches")
+    args = parser.parse_args()
+
+    from college_rag import CollegeRAGSystem
+
+    questions = list(DEFAULT_FAQ_QUESTIONS)
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions += [line.strip() for line in f if line.strip()]
+
+    rag = CollegeRAGSystem(os.getenv("GROQ_API_KEY"))
+    rag.load(args.index)
+    warm(rag, args.output, questions, args.log, args.top_n, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Versioned index snapshots for hot-swapping the knowledge base.
+
+An IndexSnapshot bundles everything a query reads (FAISS index, chunk texts,
+metadata) under one version. The serving system holds a single reference to
+the current snapshot and replaces it with one assignment, RCU style:
+
+- readers take `rag.snapshot` once per query and use only that object, so the
+  hot search path takes no lock;
+- a reload builds the new snapshot off to the side and swaps the reference;
+- requests already running keep the old snapshot alive until they return,
+  and it is freed when the last reference drops.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from chunk_store import AppendedChunks, CompressedChunkStore, open_or_build
+from metadata_store import MetadataStore
+from sharding import ShardedIndex
+
+
+def index_version(serialized_index) -> str:
+    """Short content hash identifying an index build"""
+    return hashlib.sha1(np.asarray(serialized_index).tobytes()).hexdigest()[:12]
+
+
+class IndexSnapshot:
+    """Index, chunk texts and metadata that are searched together.
+
+    Snapshots are treated as immutable once published to a serving system;
+    live ingestion publishes an `extended` copy instead. The offline builders
+    (add_*.py) still append to a private one in place.
+    """
+
+    def __init__(self, index, documents: List[str], metadata: List[Dict],
+                 version: Optional[str] = None, source: Optional[str] = None):
+        self.index = index
+        self.documents = documents
+        self.metadata = metadata
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+        self.shards: Optional[ShardedIndex] = None  # optional routed view of `index`
+        # Versions this snapshot was extended from -> their length; rows past
+        # that are chunks appended since (see extended)
+        self.lineage: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def empty(cls, embedding_dim: int) -> "IndexSnapshot":
+        return cls(faiss.IndexFlatL2(embedding_dim), [], [])
+
+    @classmethod
+    def from_file(cls, filename: str, chunk_store: bool = False,
+                  columnar_metadata: bool = False) -> "IndexSnapshot":
+        """Load a snapshot saved by CollegeRAGSystem.save
+        
+        With chunk_store, chunk texts are served from a compressed file next
+        to the index instead of being kept in memory: the one the index was
+        saved with, or `<filename>.chunks`, built on first use from the texts
+        of an index saved without one. With columnar_metadata, metadata is a
+        MetadataStore: read straight from the columns of a columnar file, or
+        converted from the per-chunk dicts of an older one.
+        """
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        version = index_version(data['index'])
+        index = faiss.deserialize_index(data['index'])
+        if 'chunks_file' in data:
+            documents = CompressedChunkStore(os.path.join(os.path.dirname(filename), data['chunks_file']))
+            if documents.version != version or len(documents) != index.ntotal:
+                documents.close()
+                raise ValueError(f"{data['chunks_file']} does not hold the chunks of {filename}")
+            if not chunk_store:
+                documents = list(documents)
+        else:
+            documents = data['documents']
+            if chunk_store:
+                documents = open_or_build(documents, filename + ".chunks", version=version)
+        if 'metadata_columns' in data:
+            metadata = MetadataStore.from_columns(data['metadata_columns'])
+            if not columnar_metadata:
+                metadata = metadata.to_dicts()
+        else:
+            metadata = data['metadata']
+            if columnar_metadata:
+                metadata = MetadataStore.from_dicts(metadata)
+        return cls(
+            index,
+            documents,
+            metadata,
+            version=version,
+            source=filename,
+        )
+
+    def extended(self, documents: List[str], metadata: List[Dict], embeddings: np.ndarray) -> "IndexSnapshot":
+        """New snapshot with chunks appended; this one is left untouched (copy-on-write)
+
+        A compressed chunk store is shared, with the new chunks in an
+        in-memory tail (see chunk_store.AppendedChunks); the store file is
+        rebuilt with them on the next load of a saved index.
+        """
+        index = faiss.clone_index(self.index)
+        index.add(np.asarray(embeddings, dtype=np.float32))
+        if isinstance(self.metadata, MetadataStore):
+            new_metadata = self.metadata.extend(metadata)
+        else:
+            new_metadata = list(self.metadata) + list(metadata)
+        if hasattr(self.documents, "appended"):
+            new_documents = self.documents.appended(documents)
+        else:
+            new_documents = list(self.documents) + list(documents)
+        snapshot = IndexSnapshot(
+            index,
+            new_documents,
+            new_metadata,
+            version=index_version(faiss.serialize_index(index)),
+            source=self.source,
+        )
+        snapshot.lineage = dict(self.lineage)
+        if self.version is not None:
+            snapshot.lineage[self.version] = len(self)
+        return snapshot
+
+    def appended_since(self, version: Optional[str]) -> Optional[int]:
+        """First row appended after `version`, if this snapshot extends it (len(self) if it is it)"""
+        if version is not None and version == self.version:
+            return len(self)
+        return self.lineage.get(version)
+
+    def build_shards(self, **kwargs) -> ShardedIndex:
+        """Split the flat index into per-family shards searched through a router"""
+        self.shards = ShardedIndex.build(self.index, self.metadata, **kwargs)
+        return self.shards
+
+    def to_file(self, filename: str, columnar_metadata: Optional[bool] = None,
+                chunk_store: Optional[bool] = None) -> str:
+        """Write the snapshot atomically so a watcher never sees a partial file
+
+        Metadata is saved as MetadataStore columns when columnar_metadata is
+        set (by default: when it already is a MetadataStore), else as dicts.
+        With chunk_store (by default: when the texts already are in one) the
+        texts go to a compressed `<filename>.<version>.chunks` file that the
+        index file names, instead of into the index file. A store's
+        compressed blocks are copied, not decompressed.
+        """
+        serialized = faiss.serialize_index(self.index)
+        version = index_version(serialized)
+        if columnar_metadata is None:
+            columnar_metadata = isinstance(self.metadata, MetadataStore)
+        if chunk_store is None:
+            chunk_store = isinstance(self.documents, (CompressedChunkStore, AppendedChunks))
+        data = {'index': serialized}
+        chunks_file = f"{filename}.{version}.chunks" if chunk_store else None
+        if chunk_store:
+            self._write_chunks(chunks_file, version)
+            data['chunks_file'] = os.path.basename(chunks_file)
+        else:
+            data['documents'] = list(self.documents)
+        if columnar_metadata:
+            store = self.metadata if isinstance(self.metadata, MetadataStore) else MetadataStore.from_dicts(self.metadata)
+            data['metadata_columns'] = store.to_columns()
+        else:
+            data['metadata'] = [dict(meta) for meta in self.metadata]
+        tmp = filename + ".tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(tmp, filename)
+        # Chunk files of earlier saves; snapshots still serving them keep their mappings
+        for old in glob.glob(glob.escape(filename) + ".*.chunks"):
+            if old != chunks_file:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        self.version = version
+        self.source = filename
+        return self.version
+
+    def _write_chunks(self, chunks_file: str, version: str):
+        documents = self.documents
+        if isinstance(documents, CompressedChunkStore) and documents.filename == chunks_file:
+            return  # saved again unchanged
+        if isinstance(documents, AppendedChunks):
+            store = documents.store.write_appended(documents.tail, chunks_file, version=version)
+        elif isinstance(documents, CompressedChunkStore):
+            store = documents.write_appended([], chunks_file, version=version)
+        else:
+            store = CompressedChunkStore.build(documents, chunks_file, version=version)
+        store.close()
+
+    def info(self) -> Dict:
+        info = {
+            "version": self.version,
+            "documents": len(self.documents),
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+        }
+        if self.shards is not None:
+            info["sharding"] = self.shards.info()
+        return info
+
+
+def _report_released(version: Optional[str]):
+    print(f"✓ Released index snapshot {version}")
+
+
+class SnapshotWatcher:
+    """Polls an index file and hot-reloads it into a running system when it changes"""
+
+    def __init__(self, rag, filename: str, interval: float = 5.0):
+        self.rag = rag
+        self.filename = filename
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._last_seen = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = self._stat()
+            if current is None or current == self._last_seen:
+                continue
+            # Wait one more interval so a writer that is not atomic has finished
+            if self._stop.wait(self.interval) or self._stat() != current:
+                continue
+            # An admin reload that is already running may have read the file
+            # before it changed, so only a reload of our own marks it seen
+            if self.rag.reload(self.filename, background=False):
+                self._last_seen = current
+
+    def start(self) -> "SnapshotWatcher":
+        self._thread.start()
+        print(f"✓ Watching {self.filename} for index updates")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def track_release(snapshot: IndexSnapshot):
+    """Log when a retired snapshot has drained and been freed"""
+    weakref.finalize(snapshot, _report_released, snapshot.version)
@@ -0,0 +1,254 @@
+"""Background ingestion of uploaded documents into the live index.
+
+Uploads are queued as jobs and handled by a small pool of worker threads.
+Each worker extracts the text (PDF pages or a .txt file), chunks it the way
+the add_*.py builders do, embeds the chunks in batches and appends them to
+the running system with CollegeRAGSystem.append_chunks. That swaps in an
+extended copy of the snapshot, so /ask keeps serving the old snapshot until
+the new chunks are searchable and never waits on a lock.
+
+    queue = IngestionQueue(rag, workers=2, persist_path="college_rag_complete.pkl")
+    job = queue.submit("uploads/notice.pdf", "notice.pdf", doc_type="notice")
+    queue.get(job.id).to_dict()
+
+Jobs live in memory only. Uploads are kept on disk (see upload_path), and
+requeue_uploads() queues those whose chunks are not in the loaded index
+again at startup, so a restart never loses an upload.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import PyPDF2
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+_UPLOAD_NAME = re.compile(r"^[0-9a-f]{8}_(.+)$")
+STATUSES = ("queued", "extracting", "embedding", "indexing", "saving", "done", "failed")
+
+
+class IngestJob:
+    """One uploaded document and its progress through the pipeline"""
+
+    def __init__(self, path: str, filename: str, doc_type: str, metadata: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.filename = filename
+        self.doc_type = doc_type
+        self.metadata = metadata or {}
+        self.status = "queued"
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.error: Optional[str] = None
+        self.index_version: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done":
+            return 1.0
+        if not self.chunks_total:
+            return 0.0
+        # Embedding is the slow part; indexing and saving take the last 10%
+        return 0.9 * self.chunks_done / self.chunks_total
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "doc_type": self.doc_type,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "chunks_total": self.chunks_total,
+            "chunks_done": self.chunks_done,
+            "error": self.error,
+            "index_version": self.index_version,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def indexed_sources(snapshot) -> set:
+    """Source file names already present in a snapshot"""
+    metadata = snapshot.metadata
+    if hasattr(metadata, "distinct"):
+        return set(metadata.distinct("source"))
+    return {meta.get("source") for meta in metadata}
+
+
+def upload_path(directory: str, filename: str) -> str:
+    """Unique path on disk for an upload, so concurrent uploads of the same file never share one"""
+    return os.path.join(directory, f"{uuid.uuid4().hex[:8]}_{filename}")
+
+
+def save_upload_info(path: str, doc_type: str, metadata: Optional[Dict] = None):
+    """Keep an upload's form fields next to it, for requeue_uploads"""
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"doc_type": doc_type, "metadata": metadata or {}}, f)
+
+
+def remove_upload(path: str):
+    for name in (path, path + ".json"):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def extract_units(path: str, filename: str, doc_type: str, metadata: Dict) -> List[Tuple[str, Dict]]:
+    """(text, metadata) per PDF page or for the whole text file, as add_pdf/add_all_data.py store them"""
+    if filename.lower().endswith(".pdf"):
+        units = []
+        with open(path, "rb") as f:
+            for page_num, page in enumerate(PyPDF2.PdfReader(f).pages):
+                text = page.extract_text() or ""
+                if text.strip():
+                    units.append((text, dict(metadata, source=filename, type=doc_type, page=page_num + 1)))
+        return units
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    title = metadata.get("title") or os.path.splitext(filename)[0].replace("_", " ").title()
+    return [(text, dict(metadata, title=title, source=filename, type=doc_type))]
+
+
+class IngestionQueue:
+    """Job queue and worker pool that feeds uploads into a running CollegeRAGSystem"""
+
+    def __init__(self, rag, workers: int = 2, persist_path: Optional[str] = None, chunk_size: int = 500,
+                 batch_size: int = 32, max_jobs: int = 1000):
+        """
+        Args:
+            persist_path: if set, save the index there after each job so the
+                new chunks survive a restart (and a SnapshotWatcher reload).
+            max_jobs: finished jobs beyond this many are forgotten, oldest first.
+        """
+        self.rag = rag
+        self.persist_path = persist_path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_jobs = max_jobs
+
+        self._queue: "queue.Queue[IngestJob]" = queue.Queue()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"ingest-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, path: str, filename: str, doc_type: str = "uploaded_document",
+               metadata: Optional[Dict] = None) -> IngestJob:
+        """Queue a saved upload; raises ValueError for unsupported or duplicate files"""
+        if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise ValueError(f"Unsupported file type: {filename} (expected {', '.join(SUPPORTED_EXTENSIONS)})")
+        job = IngestJob(path, filename, doc_type, metadata)
+        with self._lock:
+            pending = {j.filename for j in self._jobs.values() if not j.finished}
+            if filename in pending or filename in indexed_sources(self.rag.snapshot):
+                raise ValueError(f"{filename} is already indexed or queued")
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+        self._queue.put(job)
+        return job
+
+    def requeue_uploads(self, directory: str) -> List[IngestJob]:
+        """Queue the uploads in directory whose chunks are not in the index, oldest first"""
+        if not os.path.isdir(directory):
+            return []
+        uploads = []
+        for name in os.listdir(directory):
+            match = _UPLOAD_NAME.match(name)
+            path = os.path.join(directory, name)
+            if match and name.lower().endswith(SUPPORTED_EXTENSIONS):
+                uploads.append((os.path.getmtime(path), path, match.group(1)))
+
+        jobs = []
+        for _, path, filename in sorted(uploads):
+            info = {}
+            if os.path.exists(path + ".json"):
+                with open(path + ".json", encoding="utf-8") as f:
+                    info = json.load(f)
+            try:
+                jobs.append(self.submit(path, filename, info.get("doc_type", "uploaded_document"),
+                                        info.get("metadata")))
+            except ValueError:
+                continue  # indexed already, or an earlier copy is queued
+        if jobs:
+            print(f"✓ Re-queued {len(jobs)} uploads from {directory} that are not in the index")
+        return jobs
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self, limit: int = 50) -> List[IngestJob]:
+        """Most recent jobs first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))[:limit]
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            counts = {status: 0 for status in STATUSES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {"queue_depth": self._queue.qsize(), "workers": len(self._workers), "statuses": counts}
+
+    def _forget_old_jobs(self):
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [j.id for j in self._jobs.values() if j.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._process(job)
+            except Exception as e:
+                job.status, job.error = "failed", str(e)
+                print(f"✗ Ingestion of {job.filename} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    def _process(self, job: IngestJob):
+        job.started_at = time.time()
+        job.status = "extracting"
+        documents, metadata = [], []
+        for text, meta in extract_units(job.path, job.filename, job.doc_type, job.metadata):
+            for chunk_idx, chunk in enumerate(self.rag._chunk_text(text, chunk_size=self.chunk_size)):
+                if len(chunk.strip()) > 50:  # Skip very small chunks
+                    documents.append(chunk)
+                    metadata.append(dict(meta, chunk=chunk_idx))
+        if not documents:
+            raise ValueError("no extractable text (scanned PDFs need OCR, see add_pdfs_ocr.py)")
+
+        job.status = "embedding"
+        job.chunks_total = len(documents)
+        batches = []
+        for i in range(0, len(documents), self.batch_size):
+            batches.append(self.rag._embed(documents[i:i + self.batch_size]))
+            job.chunks_done = min(i + self.batch_size, len(documents))
+
+        job.status = "indexing"
+        snapshot = self.rag.append_chunks(documents, metadata, np.vstack(batches))
+        job.index_version = snapshot.version
+
+        if self.persist_path:
+            job.status = "saving"
+            with self._save_lock:
+                self.rag.save(self.persist_path)
+        job.status = "done"
+        print(f"✓ Ingested {job.filename}: {len(documents)} chunks in "
+              f"{time.time() - job.started_at:.1f}s (version {job.index_version})")
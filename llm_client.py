@@ -0,0 +1,250 @@
+"""Resilient client for the Groq chat completions API.
+
+Wraps the Groq SDK with a pooled keep-alive HTTP client, per-call deadlines,
+jittered retries on retryable errors, optional hedged requests and a circuit
+breaker that fails fast while the upstream is unhealthy.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Dict, List, Optional
+
+import httpx
+from groq import APIConnectionError, APIStatusError, Groq
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM could not produce an answer before the deadline."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without contacting the upstream while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go upstream right now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class LLMClient:
+    """Chat completions client with timeouts, retries, hedging and a breaker."""
+
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "llama-3.1-8b-instant",
+        base_url: Optional[str] = None,
+        timeout: float = 10.0,
+        deadline: float = 20.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 2.0,
+        hedge_after: Optional[float] = None,
+        pool_size: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """
+        Args:
+            timeout: Upper bound for a single upstream attempt, in seconds.
+            deadline: Upper bound for a whole call including retries.
+            hedge_after: If set, send a second identical request when the
+                first has not answered after this many seconds and use
+                whichever finishes first.
+            pool_size: Number of keep-alive connections kept to the upstream.
+        """
+        self.model = model
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+
+        # Groq's own retry loop is disabled so that retries respect our deadline
+        self._http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=60.0,
+            ),
+        )
+        self.client = Groq(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=self._http,
+        )
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size) if hedge_after else None
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "failures": 0,
+            "short_circuits": 0,
+        }
+
+    def chat(self, messages: List[Dict], temperature: float = 0.3,
+             max_tokens: int = 500, deadline: Optional[float] = None) -> str:
+        """Return the assistant message content for a chat completion.
+
+        Raises:
+            CircuitOpenError: The breaker is open; the upstream was not called.
+            LLMUnavailableError: All attempts failed or the deadline passed.
+        """
+        self._count("calls")
+        if not self.breaker.allow_request():
+            self._count("short_circuits")
+            raise CircuitOpenError("LLM upstream is unhealthy (circuit open)")
+
+        stop_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        last_error: Optional[Exception] = None
+
+        while True:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                content = self._attempt(messages, temperature, max_tokens,
+                                        min(self.timeout, remaining))
+            except Exception as e:
+                last_error = e
+                if not self._is_retryable(e):
+                    # The upstream answered, it just rejected this request
+                    self.breaker.record_success()
+                    self._count("failures")
+                    raise LLMUnavailableError(f"LLM request rejected: {e}") from e
+                if attempt >= self.max_retries:
+                    break
+                pause = self._backoff(attempt, e)
+                if time.monotonic() + pause >= stop_at:
+                    break
+                time.sleep(pause)
+                attempt += 1
+                self._count("retries")
+                continue
+
+            self.breaker.record_success()
+            return content
+
+        self.breaker.record_failure()
+        self._count("failures")
+        if last_error is None:
+            raise LLMUnavailableError("LLM deadline exceeded")
+        raise LLMUnavailableError(f"LLM request failed: {last_error}") from last_error
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self._http.close()
+
+    # --- Internals ---
+    def _call(self, messages: List[Dict], temperature: float, max_tokens: int,
+              timeout: float) -> str:
+        response = self.client.with_options(timeout=timeout).chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+
+    def _attempt(self, messages: List[Dict], temperature: float, max_tokens: int,
+                 timeout: float) -> str:
+        """One logical attempt, optionally hedged with a second request."""
+        if self._hedge_pool is None or timeout <= self.hedge_after:
+            return self._call(messages, temperature, max_tokens, timeout)
+
+        started = time.monotonic()
+        primary = self._hedge_pool.submit(self._call, messages, temperature, max_tokens, timeout)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge_timeout = max(timeout - (time.monotonic() - started), 0.001)
+        hedge = self._hedge_pool.submit(self._call, messages, temperature, max_tokens, hedge_timeout)
+
+        first_error: Optional[Exception] = None
+        for future in as_completed([primary, hedge]):
+            error = future.exception()
+            if error is None:
+                if future is hedge:
+                    self._count("hedge_wins")
+                return future.result()
+            first_error = first_error or error
+        raise first_error
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, APIConnectionError):  # includes timeouts
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code in self.RETRYABLE_STATUS
+        return False
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given."""
+        pause = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                pause = max(pause, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+        return pause
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
@@ -0,0 +1,290 @@
+"""Open-loop load test of the HTTP API against a fake LLM server.
+
+Starts fake_llm_server.FakeLLMServer and app.py (pointed at it through
+GROQ_BASE_URL), then sends Poisson arrivals at increasing request rates.
+Each request is sent at its scheduled time whether or not earlier ones have
+returned, and latency is measured from that scheduled time, so a backed-up
+server shows up as latency instead of silently lowering the offered load.
+
+    python loadtest.py --rates 1 2 4 8 16 --duration 20 --llm-latency 0.5
+    python loadtest.py --url http://127.0.0.1:5000 --rates 5 10   # already running server
+
+Simulated clients are told apart by X-Forwarded-For, so a server started by
+hand needs TRUSTED_PROXIES=1; otherwise all of them share one rate limit.
+
+Questions are replayed from --questions (a JSON list, or JSON lines with a
+"question" field such as query_log.jsonl) in an order fixed by --seed.
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from fake_llm_server import FakeLLMServer
+
+DEFAULT_QUESTIONS = [
+    "What are the hostel fees?",
+    "What is the fee structure for BTech?",
+    "How do I file an RTI application?",
+    "What is the maternity leave policy for faculty?",
+    "What are the hostel timings?",
+    "What are the mess timings?",
+    "What facilities are available in the hostel?",
+    "How many credits do I need to graduate?",
+    "Tell me about the exam pattern",
+    "What subjects are there in 3rd year CSE?",
+    "Who is the director of IIIT Nagpur?",
+    "What is the refund policy for fees?",
+    "How can I apply for a scholarship?",
+    "Where is the library and what are its timings?",
+    "What documents are needed for admission?",
+    "What is the placement record of the college?",
+]
+
+
+def load_questions(path: Optional[str]) -> List[str]:
+    if not path:
+        return list(DEFAULT_QUESTIONS)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        return [q if isinstance(q, str) else q["question"] for q in data]
+    except json.JSONDecodeError:
+        return [json.loads(line)["question"] for line in text.splitlines() if line.strip()]
+
+
+def poisson_schedule(rate: float, duration: float, rng: random.Random) -> List[float]:
+    """Send offsets (seconds from step start) of a Poisson process"""
+    offsets, t = [], rng.expovariate(rate)
+    while t < duration:
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+
+class AppServer:
+    """app.py in a subprocess, with its own port, caches and logs"""
+
+    def __init__(self, command: List[str], port: int, env: Dict[str, str], startup_timeout: float = 300):
+        self.url = f"http://127.0.0.1:{port}"
+        self.workdir = tempfile.mkdtemp(prefix="loadtest-")
+        self.log_path = os.path.join(self.workdir, "app.log")
+        self.env = dict(os.environ, PORT=str(port), PYTHONUNBUFFERED="1",
+                        FAQ_CACHE_FILE=os.path.join(self.workdir, "faq_cache.pkl"),
+                        QUERY_LOG_FILE=os.path.join(self.workdir, "query_log.jsonl"))
+        self.env.update(env)
+        self.command = command
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self) -> "AppServer":
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(self.command, env=self.env, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"app exited with {self.process.returncode}; see {self.log_path}")
+            try:
+                if requests.get(self.url + "/", timeout=1).ok:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.__exit__()
+        raise RuntimeError(f"app did not start within {self.startup_timeout}s; see {self.log_path}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._log.close()
+
+
+class LoadGenerator:
+    """Sends scheduled requests from a thread pool, one keep-alive session per thread"""
+
+    def __init__(self, url: str, timeout: float = 30.0, max_concurrency: int = 256, clients: int = 100):
+        self.url = url.rstrip("/") + "/ask"
+        self.timeout = timeout
+        self.clients = clients
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _send(self, scheduled: float, question: str, client: int) -> Dict:
+        # Distinct X-Forwarded-For values stand in for separate users (per-client rate
+        # limits); the app only honours them with TRUSTED_PROXIES=1, as if behind a proxy
+        headers = {"X-Forwarded-For": f"10.0.{client // 256}.{client % 256}"}
+        try:
+            response = self._session().post(self.url, json={"question": question},
+                                            headers=headers, timeout=self.timeout)
+            outcome = response.status_code
+            path = response.json().get("path") if response.ok else None
+        except requests.Timeout:
+            outcome, path = "timeout", None
+        except requests.RequestException:
+            outcome, path = "connection", None
+        return {"latency": time.perf_counter() - scheduled, "status": outcome, "path": path}
+
+    def run_step(self, rate: float, duration: float, questions: List[str], rng: random.Random) -> Dict:
+        offsets = poisson_schedule(rate, duration, rng)
+        picks = [(rng.choice(questions), rng.randrange(self.clients)) for _ in offsets]
+        futures = []
+        start = time.perf_counter()
+        for offset, (question, client) in zip(offsets, picks):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self.pool.submit(self._send, scheduled, question, client))
+        results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+        return summarize(rate, duration, elapsed, results)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+def summarize(rate: float, duration: float, elapsed: float, results: List[Dict]) -> Dict:
+    ok = [r["latency"] for r in results if r["status"] == 200]
+    statuses = Counter(str(r["status"]) for r in results)
+    sent = len(results)
+
+    def pct(q):
+        return float(np.percentile(ok, q)) if ok else None
+
+    return {
+        "rate": rate,
+        "duration": duration,
+        "sent": sent,
+        "ok": len(ok),
+        "throughput": len(ok) / max(elapsed, duration),
+        "error_rate": 1 - len(ok) / sent if sent else 0.0,
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "statuses": dict(statuses),
+        "paths": dict(Counter(r["path"] for r in results if r["path"])),
+    }
+
+
+def saturated(step: Dict, slo_p99: float, max_error_rate: float) -> bool:
+    """Step misses the SLO: too many errors or p99 latency too high
+
+    Open-loop arrivals mean a server that cannot keep up shows up in both.
+    """
+    if step["sent"] == 0:
+        return False
+    return step["error_rate"] > max_error_rate or step["p99"] is None or step["p99"] > slo_p99
+
+
+def print_table(steps: List[Dict], saturation: Optional[float], sustainable: Optional[float]):
+    print(f"\n{'rate/s':>8}{'sent':>7}{'thru/s':>9}{'err %':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}  statuses")
+    for s in steps:
+        fmt = lambda v: f"{v:>8.3f}" if v is not None else f"{'-':>8}"
+        statuses = " ".join(f"{k}:{v}" for k, v in sorted(s["statuses"].items()))
+        print(f"{s['rate']:>8.1f}{s['sent']:>7}{s['throughput']:>9.2f}{s['error_rate'] * 100:>8.1f}"
+              f"{fmt(s['p50'])}{fmt(s['p95'])}{fmt(s['p99'])}  {statuses}")
+    print(f"\nmax sustainable rate: {sustainable if sustainable is not None else '-'} req/s; "
+          f"saturation at: {saturation if saturation is not None else 'not reached'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the chatbot API")
+    parser.add_argument("--url", help="test an already running server instead of starting app.py")
+    parser.add_argument("--app-cmd", default=f"{sys.executable} app.py", help="command that starts the API")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app (repeatable), e.g. USE_SHARDS=1")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per rate step")
+    parser.add_argument("--questions", help="JSON list or JSON lines file of questions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clients", type=int, default=100, help="distinct simulated client addresses")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-concurrency", type=int, default=256)
+    parser.add_argument("--slo-p99", type=float, default=2.0, help="p99 latency target in seconds")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-going", action="store_true", help="run all rates after saturation")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-token-rate", type=float, default=None)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    rng = random.Random(args.seed)
+    fake = None
+    stack = ExitStack()
+    if args.url:
+        url = args.url
+    else:
+        fake = stack.enter_context(FakeLLMServer(
+            latency=args.llm_latency, jitter=args.llm_jitter, token_rate=args.llm_token_rate,
+            error_rate=args.llm_error_rate, seed=args.seed))
+        env = {"GROQ_BASE_URL": fake.base_url, "GROQ_API_KEY": "fake-key", "TRUSTED_PROXIES": "1"}
+        env.update(item.split("=", 1) for item in args.env)
+        print(f"Fake LLM at {fake.base_url}; starting `{args.app_cmd}` on port {args.port}...")
+        app = stack.enter_context(AppServer(shlex.split(args.app_cmd), args.port, env))
+        url = app.url
+        print(f"✓ App is up (log: {app.log_path})")
+
+    generator = LoadGenerator(url, args.timeout, args.max_concurrency, args.clients)
+    stack.callback(generator.close)
+    steps, saturation, sustainable = [], None, None
+    with stack:
+        for rate in args.rates:
+            print(f"→ {rate} req/s for {args.duration}s")
+            step = generator.run_step(rate, args.duration, questions, rng)
+            steps.append(step)
+            if saturated(step, args.slo_p99, args.max_error_rate):
+                saturation = saturation if saturation is not None else rate
+                if not args.keep_going:
+                    break
+            elif saturation is None:
+                sustainable = rate
+
+    report = {
+        "url": url,
+        "seed": args.seed,
+        "questions": len(questions),
+        "slo_p99": args.slo_p99,
+        "max_error_rate": args.max_error_rate,
+        "fake_llm": None if fake is None else {"latency": args.llm_latency, "jitter": args.llm_jitter,
+                                            "token_rate": args.llm_token_rate, "error_rate": args.llm_error_rate,
+                                            "requests_served": fake.requests_served},
+        "steps": steps,
+        "max_sustainable_rate": sustainable,
+        "saturation_rate": saturation,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_table(steps, saturation, sustainable)
+    print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
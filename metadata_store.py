@@ -0,0 +1,249 @@
+"""Columnar metadata store for chunk metadata.
+
+The saved index keeps one dict per chunk with the same few `source`, `type`
+and `title` strings repeated hundreds of times. MetadataStore keeps one NumPy
+array per key instead: strings are interned in a shared table and stored as
+integer codes, integers are stored in the narrowest dtype that fits. Rows are
+materialized on demand as small `__slots__` records, and filters run
+vectorized over whole columns.
+
+    store = MetadataStore.from_dicts(metadata)
+    store[12].get("source")
+    store.filter(type="pdf_document", source=["hostel_fee.pdf", "fee_deatails..pdf"])
+
+to_columns() / from_columns() convert to and from plain lists, dicts and
+arrays, which is how IndexSnapshot saves the store, so a columnar index file
+loads without building a dict per chunk.
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+import numpy as np
+
+MISSING_CODE = -1
+MISSING_INT = np.iinfo(np.int64).min  # missing cell marker while merging int columns
+
+
+def _int_dtype(low: int, high: int):
+    """Narrowest signed dtype for [low, high], keeping its minimum free as the missing marker"""
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min < low and high <= info.max:
+            return dtype
+    raise OverflowError(f"values {low}..{high} do not fit in int64")
+
+
+class MetadataRecord(Mapping):
+    """Read-only dict-like view of one row of a MetadataStore"""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "MetadataStore", row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._store.value(key, self._row)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in self._store.columns if self._store.value(key, self._row) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"MetadataRecord({self.to_dict()!r})"
+
+
+class MetadataStore(Sequence):
+    """Per-key columns with interned strings; rows read back as MetadataRecord
+
+    String columns hold codes into `strings` (-1 when missing); integer columns
+    mark missing cells with their dtype's minimum value.
+    """
+
+    def __init__(self, count: int, strings: List[str], columns: Dict[str, np.ndarray],
+                 kinds: Dict[str, str]):
+        self._count = count
+        self.strings = strings
+        self._codes = {s: i for i, s in enumerate(strings)}
+        self.columns = columns
+        self.kinds = kinds  # "str", "int" or "object"
+
+    @classmethod
+    def from_dicts(cls, rows: Sequence[Dict]) -> "MetadataStore":
+        keys: List[str] = []
+        for row in rows:
+            for key in row:
+                if key not in keys:
+                    keys.append(key)
+
+        strings: List[str] = []
+        codes: Dict[str, int] = {}
+        columns, kinds = {}, {}
+        for key in keys:
+            values = [row.get(key) for row in rows]
+            present = [v for v in values if v is not None]
+            if all(isinstance(v, str) for v in present):
+                column = np.full(len(rows), MISSING_CODE, dtype=np.int32)
+                for i, value in enumerate(values):
+                    if value is not None:
+                        code = codes.get(value)
+                        if code is None:
+                            code = codes[value] = len(strings)
+                            strings.append(value)
+                        column[i] = code
+                kinds[key] = "str"
+            elif all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present):
+                dtype = _int_dtype(min(present, default=0), max(present, default=0))
+                missing = np.iinfo(dtype).min
+                column = np.array([missing if v is None else v for v in values], dtype=dtype)
+                kinds[key] = "int"
+            else:
+                # Rare mixed-type keys keep their Python values
+                column = np.array(values, dtype=object)
+                kinds[key] = "object"
+            columns[key] = column
+        # Narrow the string codes once the table size is known
+        code_dtype = _int_dtype(MISSING_CODE, max(len(strings) - 1, 0))
+        for key, kind in kinds.items():
+            if kind == "str":
+                columns[key] = columns[key].astype(code_dtype)
+        return cls(len(rows), strings, columns, kinds)
+
+    def to_columns(self) -> Dict:
+        """Plain picklable form (no MetadataStore class needed to read it back)"""
+        return {"count": self._count, "strings": list(self.strings),
+                "columns": dict(self.columns), "kinds": dict(self.kinds)}
+
+    @classmethod
+    def from_columns(cls, data: Dict) -> "MetadataStore":
+        return cls(data["count"], list(data["strings"]), dict(data["columns"]), dict(data["kinds"]))
+
+    def value(self, key: str, row: int) -> Any:
+        """Value of one cell, or None if the row has no such key"""
+        column = self.columns.get(key)
+        if column is None:
+            return None
+        kind = self.kinds[key]
+        if kind == "str":
+            code = column[row]
+            return None if code == MISSING_CODE else self.strings[code]
+        if kind == "int":
+            value = column[row]
+            return None if value == np.iinfo(column.dtype).min else int(value)
+        return column[row]
+
+    def filter(self, **conditions) -> np.ndarray:
+        """Row ids matching every condition; a list value means "any of these"
+
+        Example: store.filter(type="text", source=["a.txt", "b.txt"])
+        """
+        mask = np.ones(self._count, dtype=bool)
+        for key, wanted in conditions.items():
+            column = self.columns.get(key)
+            if column is None:
+                return np.empty(0, dtype=np.int64)
+            wanted = list(wanted) if isinstance(wanted, (list, tuple, set)) else [wanted]
+            kind = self.kinds[key]
+            if kind == "str":
+                targets = [self._codes[w] for w in wanted if w in self._codes]
+                mask &= np.isin(column, np.array(targets, dtype=np.int64))
+            elif kind == "int":
+                mask &= np.isin(column, np.array(wanted, dtype=np.int64)) & (column != np.iinfo(column.dtype).min)
+            else:
+                mask &= np.array([v in wanted for v in column], dtype=bool)
+        return np.flatnonzero(mask)
+
+    def distinct(self, key: str) -> List[Any]:
+        """Distinct values present in a column"""
+        column = self.columns.get(key)
+        if column is None:
+            return []
+        if self.kinds[key] == "str":
+            return [self.strings[c] for c in np.unique(column) if c != MISSING_CODE]
+        if self.kinds[key] == "int":
+            return [int(v) for v in np.unique(column) if v != np.iinfo(column.dtype).min]
+        return list({v for v in column if v is not None})
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self._count))]
+        row = int(row)
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError("metadata row out of range")
+        return MetadataRecord(self, row)
+
+    def to_dicts(self) -> List[Dict]:
+        return [record.to_dict() for record in self]
+
+    def extend(self, rows: Iterable[Dict]) -> "MetadataStore":
+        """New store with rows appended (stores are immutable once built)
+
+        Existing columns are concatenated with columns built from the new rows
+        only; no row of this store is materialized unless a key changes kind.
+        """
+        tail = MetadataStore.from_dicts(list(rows))
+        if not len(tail):
+            return self
+
+        strings = list(self.strings)
+        codes = dict(self._codes)
+        remap = np.empty(len(tail.strings), dtype=np.int64)
+        for i, string in enumerate(tail.strings):
+            code = codes.get(string)
+            if code is None:
+                code = codes[string] = len(strings)
+                strings.append(string)
+            remap[i] = code
+        code_dtype = _int_dtype(MISSING_CODE, max(len(strings) - 1, 0))
+
+        columns, kinds = {}, {}
+        for key in list(self.columns) + [k for k in tail.columns if k not in self.columns]:
+            head_kind = self.kinds.get(key, tail.kinds.get(key))
+            tail_kind = tail.kinds.get(key, head_kind)
+            if head_kind != tail_kind or head_kind == "object":
+                columns[key] = np.array(self._values(key) + tail._values(key), dtype=object)
+                kinds[key] = "object"
+            elif head_kind == "str":
+                head = self.columns.get(key)
+                head = np.full(self._count, MISSING_CODE, dtype=np.int64) if head is None else head.astype(np.int64)
+                new = tail.columns.get(key)
+                if new is None:
+                    new = np.full(len(tail), MISSING_CODE, dtype=np.int64)
+                else:
+                    new = np.where(new == MISSING_CODE, MISSING_CODE, remap[np.maximum(new, 0)])
+                columns[key] = np.concatenate([head, new]).astype(code_dtype)
+                kinds[key] = "str"
+            else:
+                head, new = self._int_values(key), tail._int_values(key)
+                present = np.concatenate([head[head != MISSING_INT], new[new != MISSING_INT]])
+                dtype = _int_dtype(int(present.min(initial=0)), int(present.max(initial=0)))
+                merged = np.concatenate([head, new])
+                merged[merged == MISSING_INT] = np.iinfo(dtype).min
+                columns[key] = merged.astype(dtype)
+                kinds[key] = "int"
+        return MetadataStore(self._count + len(tail), strings, columns, kinds)
+
+    def _values(self, key: str) -> List[Any]:
+        return [self.value(key, row) for row in range(self._count)]
+
+    def _int_values(self, key: str) -> np.ndarray:
+        """An int column as int64 with MISSING_INT for missing cells (all missing if absent)"""
+        column = self.columns.get(key)
+        if column is None:
+            return np.full(self._count, MISSING_INT, dtype=np.int64)
+        values = column.astype(np.int64)
+        values[column == np.iinfo(column.dtype).min] = MISSING_INT
+        return values
@@ -0,0 +1,224 @@
+"""Sharded FAISS search with a lightweight query router.
+
+Chunks are grouped into shards by document family (financial reports, staff
+forms, academics, RTI acts per language, campus information). A query is
+routed to the shards whose centroid is closest to it, plus any shard its
+keywords point at, and the per-shard results are merged. When the best
+routed hit scores little better than the closest shard left out, centroids
+are a poor guide for that query and the remaining shards are searched too.
+Most queries scan only a fraction of the vectors, and financial boilerplate
+no longer crowds out student-facing content.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+# First matching rule wins; patterns are matched against the source file name
+FAMILY_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("rti_hi", ("rti-act_hindi", "rti_act_hindi")),
+    ("rti_mr", ("rti_act_marathi",)),
+    ("rti_en", ("rti_act_english", "guide_to_rti")),
+    ("financial", ("audit", "balance_sheet", "annual_report", "reimburs", "honorarium",
+                   "financial", "immovable", "settlement", "अचल")),
+    ("forms", ("leave", "format", "declaration", "joining_report", "no_dues", "noc",
+               "transcript", "courier", "authority_letter")),
+    ("academics", ("syllabus", "scheme", "schme", "calender", "calendar", "exam", "holiday",
+                   "academic_program", "phd", "rule_book", "seminar")),
+    ("campus", ("hostel", "fee", "sports", "placement", "internship", "notice", "leadership",
+                "faculty", "ragging", "harassment", "science", "building")),
+]
+DEFAULT_FAMILY = "general"
+
+# Query keywords that force a shard into the search regardless of centroid score
+QUERY_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "financial": ("audit", "balance sheet", "expenditure", "income", "grant", "budget",
+                  "financial", "accounts", "reimburse", "property"),
+    "forms": ("leave", "form", "format", "application", "no dues", "joining",
+              "declaration", "noc", "transcript"),
+    "academics": ("syllabus", "course", "subject", "credit", "semester", "exam", "scheme",
+                  "curriculum", "phd", "thesis", "calendar", "timetable", "program", "holiday",
+                  "admission", "admitted", "seats"),
+    "rti_en": ("rti", "right to information", "information act"),
+    "rti_hi": ("hindi",),
+    "rti_mr": ("marathi",),
+    "campus": ("hostel", "mess", "fee", "sports", "placement", "internship", "notice",
+               "director", "faculty", "campus", "library", "ragging", "building", "floor",
+               "gym", "chairman", "harassment", "complain"),
+}
+
+# Shards only searched when the query is in (or asks for) their language
+LANGUAGE_SHARDS = {"rti_hi": "hi", "rti_mr": "mr"}
+
+_DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+# Words are matched as prefixes at a word boundary ("fee" matches "fees", not "coffee")
+_KEYWORD_PATTERNS = {
+    name: re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + ")")
+    for name, words in QUERY_KEYWORDS.items()
+}
+
+
+def document_family(meta: Dict) -> str:
+    """Shard key for a chunk, from its source file name (or title)"""
+    name = str(meta.get("source") or meta.get("title") or "").lower()
+    for family, patterns in FAMILY_RULES:
+        if any(p in name for p in patterns):
+            return family
+    return DEFAULT_FAMILY
+
+
+def is_devanagari(text: str) -> bool:
+    letters = sum(ch.isalpha() for ch in text) or 1
+    return len(_DEVANAGARI.findall(text)) / letters > 0.3
+
+
+class Shard:
+    __slots__ = ("name", "index", "ids", "centroid")
+
+    def __init__(self, name: str, vectors: np.ndarray, ids: np.ndarray):
+        self.name = name
+        self.index = faiss.IndexFlatL2(vectors.shape[1])
+        self.index.add(vectors)
+        self.ids = ids
+        centroid = vectors.mean(axis=0)
+        self.centroid = centroid / (np.linalg.norm(centroid) or 1.0)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class ShardedIndex:
+    """Per-family FAISS indexes searched through a router and merged by distance"""
+
+    def __init__(self, shards: Dict[str, Shard], max_shards: int = 3, margin: float = 0.1,
+                 fallback_margin: Optional[float] = 0.3):
+        """
+        Args:
+            max_shards: Shards picked by centroid similarity (keyword and
+                language matches are added on top).
+            margin: Only shards within this cosine similarity of the best
+                centroid are picked.
+            fallback_margin: Search every shard when the best routed hit is
+                less than this much more similar to the query than the best
+                centroid of a shard that was left out. None never falls back.
+        """
+        self.shards = shards
+        self.max_shards = max_shards
+        self.margin = margin
+        self.fallback_margin = fallback_margin
+        self.total = sum(len(shard) for shard in shards.values())
+        self._names = list(shards)
+        self._centroids = np.stack([shards[name].centroid for name in self._names]).astype(np.float32)
+
+        # Best-effort counters, updated without a lock to keep search lock-free
+        self.stats = {"queries": 0, "vectors_scanned": 0, "fallbacks": 0}
+
+    @classmethod
+    def build(cls, index, metadata: Sequence[Dict], **kwargs) -> "ShardedIndex":
+        """Split a flat index into family shards (vectors are copied, not re-embedded)"""
+        vectors = index.reconstruct_n(0, index.ntotal)
+        groups: Dict[str, List[int]] = {}
+        for idx in range(index.ntotal):
+            groups.setdefault(document_family(metadata[idx]), []).append(idx)
+
+        shards = {}
+        for name, ids in sorted(groups.items()):
+            ids = np.array(ids, dtype=np.int64)
+            shards[name] = Shard(name, np.ascontiguousarray(vectors[ids]), ids)
+        return cls(shards, **kwargs)
+
+    def route(self, query: str, query_embedding: np.ndarray) -> List[str]:
+        """Names of the shards to search for this query"""
+        text = query.lower()
+        query_language = "hi" if is_devanagari(query) else "en"
+
+        selected = {
+            name for name, pattern in _KEYWORD_PATTERNS.items()
+            if name in self.shards and pattern.search(text)
+        }
+        if query_language != "en":
+            selected.update(name for name in LANGUAGE_SHARDS if name in self.shards)
+
+        scores = self._centroids @ np.asarray(query_embedding, dtype=np.float32)
+        ranked = [
+            (float(scores[i]), name) for i, name in enumerate(self._names)
+            if name not in LANGUAGE_SHARDS or query_language != "en"
+        ]
+        ranked.sort(reverse=True)
+        if ranked:
+            best = ranked[0][0]
+            selected.update(name for score, name in ranked[:self.max_shards] if score >= best - self.margin)
+        return sorted(selected) if selected else list(self._names)
+
+    def search(self, query: str, query_embedding: np.ndarray, k: int,
+               shard_names: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as faiss Index.search for a single query: (distances, ids)
+
+        Explicit shard_names are searched as given, without the fallback.
+        """
+        names = shard_names or self.route(query, query_embedding)
+        vector = np.array([query_embedding], dtype=np.float32)
+        distances, ids, scanned = self._search_shards(names, vector, k)
+
+        if shard_names is None and self.fallback_margin is not None:
+            left_out = [i for i, name in enumerate(self._names) if name not in names]
+            if left_out:
+                # Vectors are unit length, so cosine similarity is 1 - d/2
+                best_hit = 1 - float(distances.min()) / 2 if len(distances) else -1.0
+                best_left_out = float(np.max(self._centroids[left_out] @ vector[0]))
+                if best_hit < best_left_out + self.fallback_margin:
+                    more = self._search_shards([self._names[i] for i in left_out], vector, k)
+                    distances = np.concatenate([distances, more[0]])
+                    ids = np.concatenate([ids, more[1]])
+                    scanned += more[2]
+                    self.stats["fallbacks"] += 1
+
+        self.stats["queries"] += 1
+        self.stats["vectors_scanned"] += scanned
+
+        order = np.argsort(distances, kind="stable")[:k]
+        return distances[order][None, :], ids[order][None, :]
+
+    def _search_shards(self, names: Sequence[str], vector: np.ndarray,
+                       k: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        all_distances, all_ids = [], []
+        scanned = 0
+        for name in names:
+            shard = self.shards[name]
+            distances, local = shard.index.search(vector, min(k, len(shard)))
+            keep = local[0] >= 0
+            all_distances.append(distances[0][keep])
+            all_ids.append(shard.ids[local[0][keep]])
+            scanned += len(shard)
+        distances = np.concatenate(all_distances) if all_distances else np.empty(0, dtype=np.float32)
+        ids = np.concatenate(all_ids) if all_ids else np.empty(0, dtype=np.int64)
+        return distances, ids, scanned
+
+    def self_query_misses(self) -> List[int]:
+        """Chunks whose own vector, used as the query, finds neither it nor an identical vector
+
+        A check of the router that needs no embedding model; recall vs flat
+        on real questions (evaluate_retrieval.py) is what decides if routing
+        is good enough to turn on.
+        """
+        stats = dict(self.stats)
+        misses = []
+        for shard in self.shards.values():
+            for local, idx in enumerate(shard.ids):
+                vector = shard.index.reconstruct(local)
+                distances, _ = self.search("", vector, 1)
+                if not distances.size or distances[0][0] > 1e-4:
+                    misses.append(int(idx))
+        self.stats = stats
+        return sorted(misses)
+
+    def info(self) -> Dict:
+        queries = self.stats["queries"]
+        scanned = self.stats["vectors_scanned"]
+        return {
+            "shards": {name: len(shard) for name, shard in self.shards.items()},
+            "queries": queries,
+            "fallbacks": self.stats["fallbacks"],
+            "avg_fraction_scanned": (scanned / queries / self.total) if queries and self.total else 0.0,
+        }
@@ -1,5 +1,6 @@
 import streamlit as st
 from college_rag import CollegeRAGSystem
+from faq_cache import FAQCache
 import os
 
 # Page config
@@ -38,6 +39,7 @@ def load_rag():
     api_key = st.secrets.get("GROQ_API_KEY", os.getenv("GROQ_API_KEY"))
     rag = CollegeRAGSystem(api_key)
     rag.load("college_rag_complete.pkl")
+    rag.faq_cache = FAQCache.load("faq_cache.pkl", rag.index_version)
     return rag
 
 # Header
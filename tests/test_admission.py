@@ -0,0 +1,241 @@
+"""AdmissionController: token buckets, the bounded LLM queue, and how /ask reports shedding."""
+import importlib
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import admission
+from admission import AdmissionController, Rejected
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_burst_then_refill(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    controller = AdmissionController(rate_per_client=2.0, burst=3)
+
+    for _ in range(3):
+        controller.admit("a")
+    with pytest.raises(Rejected) as info:
+        controller.admit("a")
+    assert info.value.status == 429
+    assert info.value.retry_after == pytest.approx(0.5)
+    controller.admit("b")  # buckets are per client
+
+    clock.now += 0.5
+    controller.admit("a")
+    with pytest.raises(Rejected):
+        controller.admit("a")
+
+    clock.now += 60  # refills up to the burst, no further
+    for _ in range(3):
+        controller.admit("a")
+    with pytest.raises(Rejected):
+        controller.admit("a")
+
+    metrics = controller.metrics()
+    assert metrics["admitted"] == 8
+    assert metrics["shed_rate_limited"] == 3
+
+
+def test_new_client_gets_the_whole_burst():
+    controller = AdmissionController(rate_per_client=0.001, burst=2)
+    controller.admit("a")
+    controller.admit("a")
+    with pytest.raises(Rejected):
+        controller.admit("a")
+
+
+def hold_slot(controller, acquired, release):
+    with controller.llm_slot():
+        acquired.set()
+        release.wait(5)
+
+
+def try_slot(controller, outcome):
+    try:
+        with controller.llm_slot():
+            outcome.append("served")
+    except Rejected as e:
+        outcome.append(e)
+
+
+def test_queue_full_sheds_immediately():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5.0)
+    acquired, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(controller, acquired, release))
+    holder.start()
+    acquired.wait(2)
+
+    queued = []
+    waiter = threading.Thread(target=try_slot, args=(controller, queued))
+    waiter.start()
+    wait_for(lambda: controller.metrics()["queue_depth"] == 1)
+
+    started = time.monotonic()
+    with pytest.raises(Rejected) as info:
+        with controller.llm_slot():
+            pass
+    assert time.monotonic() - started < 1.0
+    assert info.value.status == 503
+    assert info.value.reason == "server overloaded"
+
+    release.set()
+    holder.join(2)
+    waiter.join(2)
+    assert queued == ["served"]
+    metrics = controller.metrics()
+    assert metrics["shed_queue_full"] == 1
+    assert metrics["shed_queue_timeout"] == 0
+    assert metrics["llm_calls"] == 2
+
+
+def test_queue_timeout_sheds_after_the_deadline():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.1)
+    acquired, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(controller, acquired, release))
+    holder.start()
+    acquired.wait(2)
+    try:
+        started = time.monotonic()
+        with pytest.raises(Rejected) as info:
+            with controller.llm_slot():
+                pass
+        assert time.monotonic() - started >= 0.1
+        assert info.value.status == 503
+        assert info.value.reason == "queue deadline exceeded"
+    finally:
+        release.set()
+        holder.join(2)
+    metrics = controller.metrics()
+    assert metrics["shed_queue_timeout"] == 1
+    assert metrics["shed_queue_full"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+def test_released_slot_wakes_a_waiter():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=5.0)
+    acquired, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(controller, acquired, release))
+    holder.start()
+    acquired.wait(2)
+
+    outcome = []
+    waiter = threading.Thread(target=try_slot, args=(controller, outcome))
+    waiter.start()
+    wait_for(lambda: controller.metrics()["queue_depth"] == 1)
+
+    released = time.monotonic()
+    release.set()
+    waiter.join(2)
+    # Served on the release, not when its 5s deadline came up
+    assert outcome == ["served"]
+    assert time.monotonic() - released < 1.0
+    holder.join(2)
+
+
+def test_no_lost_wakeups_under_contention():
+    controller = AdmissionController(max_in_flight=2, max_queue=50, queue_timeout=5.0)
+    outcome = []
+
+    def call():
+        try:
+            with controller.llm_slot():
+                time.sleep(0.005)
+            outcome.append("served")
+        except Rejected as e:
+            outcome.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(30)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert outcome == ["served"] * 30
+    assert time.monotonic() - started < 4.0
+    metrics = controller.metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+    assert metrics["llm_calls"] == 30
+
+
+def test_retry_after_header_rounds_up_to_whole_seconds():
+    assert Rejected(429, "rate limit exceeded", 0.2).retry_after_header == "1"
+    assert Rejected(503, "server overloaded", 2.0).retry_after_header == "2"
+    assert Rejected(503, "server overloaded", 2.1).retry_after_header == "3"
+
+
+class FakeRAG:
+    """Stands in for CollegeRAGSystem so app.py imports without the embedding model"""
+
+    def __init__(self, groq_api_key, **options):
+        self.documents = []
+        self.index_version = "fake"
+        self.faq_cache = None
+        self.on_swap = []
+        self.llm_gate = None
+
+    def load(self, filename):
+        pass
+
+    def generate_answer(self, question):
+        with self.llm_gate():
+            return {"answer": "fake", "sources": [], "images": [], "path": "llm", "confidence": 0.5}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(REPO_ROOT)  # app.py downloads the index if it isn't in the working directory
+    monkeypatch.setattr("college_rag.CollegeRAGSystem", FakeRAG)
+    monkeypatch.setenv("FAQ_CACHE_FILE", str(tmp_path / "faq_cache.pkl"))
+    monkeypatch.setenv("FAQ_WARM_DELAY", "3600")
+    monkeypatch.setenv("QUERY_LOG_FILE", str(tmp_path / "query_log.jsonl"))
+    monkeypatch.setenv("INGEST_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setenv("INGEST_WORKERS", "0")
+    monkeypatch.setenv("RATE_PER_CLIENT", "0.5")
+    monkeypatch.setenv("RATE_BURST", "1")
+    sys.modules.pop("app", None)
+    try:
+        yield importlib.import_module("app")
+    finally:
+        sys.modules.pop("app", None)
+
+
+def test_ask_returns_429_with_retry_after(client):
+    http = client.app.test_client()
+    assert http.post("/ask", json={"question": "hostel fees?"}).status_code == 200
+    response = http.post("/ask", json={"question": "hostel fees?"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.get_json() == {"error": "rate limit exceeded", "retry_after": "2"}
+
+
+def test_ask_returns_503_with_retry_after(client, monkeypatch):
+    shedding = AdmissionController(max_in_flight=0, max_queue=0, queue_timeout=3.0)
+    monkeypatch.setattr(client, "admission", shedding)
+    client.rag.llm_gate = shedding.llm_slot
+    response = client.app.test_client().post("/ask", json={"question": "hostel fees?"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.get_json()["error"] == "server overloaded"
@@ -0,0 +1,27 @@
+"""Golden-target matching in evaluate_retrieval."""
+from evaluate_retrieval import reachability, score_ranking, target_hit
+
+GOLDEN = {"questions": [
+    {"id": "paged", "question": "q1", "relevant": [{"source": "a.pdf", "pages": [2]}]},
+    {"id": "plain", "question": "q2", "relevant": [{"source": "b.txt"}]},
+    {"id": "missing", "question": "q3", "relevant": [{"source": "c.pdf"}]},
+]}
+
+
+def test_page_targets_need_the_page_when_chunks_have_one():
+    target = {"source": "a.pdf", "pages": [2]}
+    assert target_hit({"source": "a.pdf", "page": 2}, target)
+    assert not target_hit({"source": "a.pdf", "page": 3}, target)
+    assert not target_hit({"source": "b.pdf", "page": 2}, target)
+
+
+def test_pageless_chunks_match_page_targets_on_source():
+    assert target_hit({"source": "a.pdf"}, {"source": "a.pdf", "pages": [2]})
+    assert score_ranking([{"source": "a.pdf"}], GOLDEN["questions"][0]["relevant"], 3)["recall"] == 1.0
+
+
+def test_reachability_flags_source_only_and_unreachable_questions():
+    paged = [{"source": "a.pdf", "page": 2}, {"source": "b.txt"}]
+    assert reachability(paged, GOLDEN) == {"source_only": [], "unreachable": ["missing"]}
+    pageless = [{"source": "a.pdf"}, {"source": "b.txt"}]
+    assert reachability(pageless, GOLDEN) == {"source_only": ["paged"], "unreachable": ["missing"]}
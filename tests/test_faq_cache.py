@@ -0,0 +1,59 @@
+"""Query log writing and rotation, and the bounded scan the FAQ warm-up does."""
+import json
+import os
+
+from faq_cache import QueryLog, top_logged_questions
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_query_log_writes_in_the_background_and_rotates(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    log = QueryLog(path, max_bytes=1000)
+    for i in range(10):
+        log.record(f"question {i}?", "llm")
+    log.flush()
+    assert [line["question"] for line in read_lines(path)] == [f"question {i}?" for i in range(10)]
+
+    for i in range(10, 20):
+        log.record(f"question {i}?", "llm")
+    log.flush()
+    assert len(read_lines(path + ".1")) == 20
+    assert not os.path.exists(path)
+
+    log.record("question 20?", "faq")
+    log.flush()
+    assert [(line["question"], line["path"]) for line in read_lines(path)] == [("question 20?", "faq")]
+    assert log.dropped == 0
+
+
+def test_query_log_drops_lines_instead_of_blocking(tmp_path):
+    log = QueryLog(str(tmp_path / "query_log.jsonl"), max_pending=1)
+    for _ in range(1000):
+        log.record("what is the hostel fee?", "faq")
+    log.flush()
+    assert log.dropped > 0
+
+
+def write_log(path, questions):
+    with open(path, "w", encoding="utf-8") as f:
+        for question in questions:
+            f.write(json.dumps({"question": question}) + "\n")
+
+
+def test_top_logged_questions_reads_only_the_tail(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    write_log(path, ["Old favourite?"] * 500 + ["What is the hostel fee?"] * 20 + ["Mess timings?"] * 10)
+    recent = top_logged_questions(path, n=5, max_bytes=30 * 40)
+    assert recent[:2] == ["What is the hostel fee?", "Mess timings?"]
+    assert top_logged_questions(path, n=1) == ["Old favourite?"]
+
+
+def test_top_logged_questions_reaches_into_the_rotated_log(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    write_log(path + ".1", ["What is the annual fee?"] * 5)
+    write_log(path, ["Mess timings?"])
+    assert top_logged_questions(path, n=2) == ["What is the annual fee?", "Mess timings?"]
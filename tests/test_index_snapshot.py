@@ -0,0 +1,110 @@
+"""Saving and loading snapshots, and SnapshotWatcher picking up index file changes."""
+import os
+import pickle
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from chunk_store import CompressedChunkStore
+from index_snapshot import IndexSnapshot, SnapshotWatcher
+
+
+class FakeRAG:
+    """Refuses the first `busy` reloads, as when an admin reload is running"""
+
+    def __init__(self, busy: int):
+        self.busy = busy
+        self.calls = 0
+        self.reloaded = threading.Event()
+
+    def reload(self, filename, background=True):
+        self.calls += 1
+        if self.calls <= self.busy:
+            return False
+        self.reloaded.set()
+        return True
+
+
+def test_watcher_retries_when_a_reload_is_already_running(tmp_path):
+    path = tmp_path / "index.pkl"
+    path.write_bytes(b"old")
+    rag = FakeRAG(busy=2)
+    watcher = SnapshotWatcher(rag, str(path), interval=0.01).start()
+    try:
+        path.write_bytes(b"newer index")
+        assert rag.reloaded.wait(5)
+        calls = rag.calls
+        time.sleep(0.1)
+        assert rag.calls == calls == 3  # seen once reloaded, not reloaded again
+    finally:
+        watcher.stop()
+
+
+def test_watcher_ignores_an_unchanged_file(tmp_path):
+    path = tmp_path / "index.pkl"
+    path.write_bytes(b"index")
+    rag = FakeRAG(busy=0)
+    watcher = SnapshotWatcher(rag, str(path), interval=0.01).start()
+    try:
+        time.sleep(0.1)
+        assert rag.calls == 0
+    finally:
+        watcher.stop()
+
+
+def make_snapshot(texts):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(len(texts), 8)).astype(np.float32)
+    index = faiss.IndexFlatL2(8)
+    index.add(vectors)
+    return IndexSnapshot(index, list(texts), [{"source": f"doc{i}.pdf"} for i in range(len(texts))])
+
+
+TEXTS = [f"chunk {i} about hostel fees and mess timings " * 5 for i in range(21)]
+
+
+def test_chunk_store_save_keeps_texts_out_of_the_index_file(tmp_path):
+    path = str(tmp_path / "index.pkl")
+    version = make_snapshot(TEXTS).to_file(path, chunk_store=True)
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    assert "documents" not in data
+    assert data["chunks_file"] == f"index.pkl.{version}.chunks"
+
+    loaded = IndexSnapshot.from_file(path, chunk_store=True)
+    assert isinstance(loaded.documents, CompressedChunkStore)
+    assert list(loaded.documents) == TEXTS
+    assert IndexSnapshot.from_file(path).documents == TEXTS
+
+
+def test_saving_an_extended_store_copies_blocks_and_drops_the_old_file(tmp_path):
+    path = str(tmp_path / "index.pkl")
+    first = make_snapshot(TEXTS).to_file(path, chunk_store=True)
+    loaded = IndexSnapshot.from_file(path, chunk_store=True)
+    extended = loaded.extended(["new chunk"], [{"source": "upload.pdf"}], np.ones((1, 8), dtype=np.float32))
+    second = extended.to_file(path)  # chunk_store follows the documents
+
+    assert sorted(os.listdir(tmp_path)) == ["index.pkl", f"index.pkl.{second}.chunks"]
+    assert first != second
+    reloaded = IndexSnapshot.from_file(path, chunk_store=True)
+    assert list(reloaded.documents) == TEXTS + ["new chunk"]
+    # The snapshot serving the old store still reads it after the file is gone
+    assert loaded.documents[20] == TEXTS[20]
+
+
+def test_old_index_files_still_build_a_chunk_store(tmp_path):
+    path = str(tmp_path / "index.pkl")
+    make_snapshot(TEXTS).to_file(path)
+    loaded = IndexSnapshot.from_file(path, chunk_store=True)
+    assert loaded.documents.filename == path + ".chunks"
+    assert list(loaded.documents) == TEXTS
+
+
+def test_write_appended_refills_a_partial_last_block(tmp_path):
+    store = CompressedChunkStore.build(TEXTS, str(tmp_path / "a.chunks"), block_size=8)
+    grown = store.write_appended(["x", "y", "z"], str(tmp_path / "b.chunks"), version="v2")
+    assert grown.version == "v2"
+    assert list(grown) == TEXTS + ["x", "y", "z"]
+    assert [grown[i] for i in range(len(grown))] == TEXTS + ["x", "y", "z"]
@@ -0,0 +1,159 @@
+"""Live ingestion: appends racing reloads, the chunk store across appends, FAQ carry-over, restarts."""
+import os
+import threading
+import time
+import zlib
+
+import faiss
+import numpy as np
+
+from chunk_store import AppendedChunks, CompressedChunkStore
+from college_rag import CollegeRAGSystem
+from embeddings import EmbeddingBackend
+from faq_cache import FAQCache
+from index_snapshot import IndexSnapshot
+from ingest import IngestionQueue, save_upload_info, upload_path
+
+DIM = 8
+
+
+class FakeBackend(EmbeddingBackend):
+    """Deterministic unit vectors, so no model is needed"""
+
+    name = "fake"
+    dim = DIM
+
+    def _encode_batch(self, texts):
+        vectors = np.array([np.random.default_rng(zlib.crc32(text.encode())).normal(size=DIM)
+                            for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def unit(*components):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[:len(components)] = components
+    return vector / np.linalg.norm(vector)
+
+
+def make_rag(**options):
+    return CollegeRAGSystem("fake-key", embedding_backend=FakeBackend(), **options)
+
+
+def make_snapshot(count=4):
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.stack([unit(*([0] * i + [1])) for i in range(count)]))
+    texts = [f"chunk {i} about hostel fees and mess timings " * 4 for i in range(count)]
+    return IndexSnapshot(index, texts, [{"source": f"doc{i}.pdf"} for i in range(count)])
+
+
+def save_index(tmp_path, count=4):
+    path = str(tmp_path / "index.pkl")
+    make_snapshot(count).to_file(path)
+    return path
+
+
+def wait_for_reload(rag):
+    deadline = time.monotonic() + 5
+    while not rag._reload_lock.acquire(blocking=False):
+        assert time.monotonic() < deadline, "reload did not finish"
+        time.sleep(0.01)
+    rag._reload_lock.release()
+
+
+def test_append_during_a_reload_of_an_older_save_keeps_the_new_chunks(tmp_path, monkeypatch):
+    path = save_index(tmp_path)
+    rag = make_rag()
+    rag.load(path)
+
+    opened, proceed = threading.Event(), threading.Event()
+    open_snapshot = rag._open_snapshot
+
+    def slow_open(filename):
+        snapshot = open_snapshot(filename)
+        opened.set()
+        proceed.wait(5)
+        return snapshot
+
+    monkeypatch.setattr(rag, "_open_snapshot", slow_open)
+    assert rag.reload(path)
+    assert opened.wait(5)
+    appended = rag.append_chunks(["uploaded notice text"], [{"source": "notice.txt"}], unit(0, 0, 0, 0, 1)[None, :])
+    proceed.set()
+    wait_for_reload(rag)
+
+    assert rag.snapshot is appended
+    assert len(rag.documents) == 5
+    assert rag.metadata[-1]["source"] == "notice.txt"
+
+
+def test_reload_of_a_rebuilt_index_replaces_unsaved_appends(tmp_path):
+    path = save_index(tmp_path)
+    rag = make_rag()
+    rag.load(path)
+    rag.append_chunks(["uploaded notice text"], [{"source": "notice.txt"}], unit(0, 0, 0, 0, 1)[None, :])
+
+    make_snapshot(6).to_file(path)
+    assert rag.reload(path, background=False)
+    assert len(rag.documents) == 6
+
+
+def test_chunk_store_is_kept_across_appends(tmp_path):
+    path = save_index(tmp_path)
+    rag = make_rag(chunk_store=True)
+    rag.load(path)
+    store = rag.documents
+    assert isinstance(store, CompressedChunkStore)
+
+    rag.append_chunks(["first upload"], [{"source": "a.txt"}], unit(0, 0, 0, 0, 1)[None, :])
+    rag.append_chunks(["second upload"], [{"source": "b.txt"}], unit(0, 0, 0, 0, 0, 1)[None, :])
+    assert isinstance(rag.documents, AppendedChunks)
+    assert rag.documents.store is store
+    assert list(rag.documents)[-2:] == ["first upload", "second upload"]
+
+    rag.save(path)
+    rag.load(path)
+    assert isinstance(rag.documents, CompressedChunkStore)
+    assert list(rag.documents)[-2:] == ["first upload", "second upload"]
+
+
+def faq_entry(question, embedding, score):
+    return {"question": question, "embedding": embedding,
+            "results": [("text", {"source": "doc0.pdf"}, score)], "response": {"answer": question}}
+
+
+def test_carried_forward_marks_only_affected_entries_stale():
+    base = make_snapshot(4)
+    base.version = "v1"
+    cache = FAQCache("v1", top_k=1)
+    cache.entries["unaffected"] = faq_entry("unaffected", unit(1), 1.0)
+    # Best match 0.6 (chunk 1); the appended chunk below scores 0.8
+    cache.entries["affected"] = faq_entry("affected", unit(0, 0.6, 0, 0, 0.8), 0.6)
+
+    extended = base.extended(["new"], [{"source": "new.txt"}], unit(0, 0, 0, 0, 1)[None, :])
+    carried = cache.carried_forward(extended)
+
+    assert carried.index_version == extended.version
+    assert list(carried.entries) == ["unaffected"]
+    assert list(carried.stale) == ["affected"]
+    assert cache.carried_forward(make_snapshot(4)) is None  # not an extension of v1
+
+
+def test_uploads_not_in_the_index_are_requeued(tmp_path):
+    rag = make_rag()
+    rag.snapshot = make_snapshot(4)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+
+    pending = upload_path(str(uploads), "notice.txt")
+    with open(pending, "w") as f:
+        f.write("The hostel mess opens at 7:30 in the morning and closes at 10 at night. " * 3)
+    save_upload_info(pending, "notice", {"title": "Mess timings"})
+    indexed = upload_path(str(uploads), "doc0.pdf")
+    open(indexed, "wb").close()
+
+    ingestion = IngestionQueue(rag, workers=0)
+    jobs = ingestion.requeue_uploads(str(uploads))
+    assert [(job.path, job.filename, job.doc_type, job.metadata) for job in jobs] == [
+        (pending, "notice.txt", "notice", {"title": "Mess timings"})]
+    assert ingestion.requeue_uploads(str(uploads)) == []  # already queued
+    assert ingestion.requeue_uploads(os.path.join(str(uploads), "missing")) == []
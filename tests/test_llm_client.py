@@ -0,0 +1,113 @@
+"""LLMClient against a local FakeLLMServer: retries, deadlines, breaker, hedging."""
+import time
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+from llm_client import CircuitBreaker, CircuitOpenError, LLMClient, LLMUnavailableError
+
+MESSAGES = [{"role": "user", "content": "What are the hostel fees?"}]
+
+
+@pytest.fixture
+def server():
+    with FakeLLMServer(latency=0.01, stall_seconds=2.0, seed=0) as fake:
+        yield fake
+
+
+def make_client(server, **options):
+    options.setdefault("backoff_base", 0.01)
+    options.setdefault("backoff_max", 0.05)
+    return LLMClient("fake-key", base_url=server.base_url, **options)
+
+
+def test_retries_a_503_then_succeeds(server):
+    client = make_client(server, max_retries=2)
+    server.fail_next(1, status=503)
+    try:
+        assert client.chat(MESSAGES).startswith("This is a fake answer")
+    finally:
+        client.close()
+    assert server.requests_served == 2
+    assert client.stats["retries"] == 1
+    assert client.breaker.state == "closed"
+
+
+def test_non_retryable_status_fails_without_retry(server):
+    client = make_client(server, max_retries=2)
+    server.fail_next(1, status=400)
+    try:
+        with pytest.raises(LLMUnavailableError):
+            client.chat(MESSAGES)
+    finally:
+        client.close()
+    assert server.requests_served == 1
+    assert client.breaker.state == "closed"
+
+
+def test_stall_hits_the_deadline(server):
+    client = make_client(server, timeout=0.3, deadline=0.5, max_retries=5)
+    server.stall_next(5)
+    started = time.monotonic()
+    try:
+        with pytest.raises(LLMUnavailableError):
+            client.chat(MESSAGES)
+    finally:
+        client.close()
+    elapsed = time.monotonic() - started
+    assert elapsed < server.stall_seconds
+    assert elapsed < 0.5 + 0.3  # deadline plus at most one in-flight attempt's slack
+    assert client.stats["failures"] == 1
+
+
+def test_breaker_opens_then_recovers_through_half_open_probe(server):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    client = make_client(server, max_retries=0, breaker=breaker)
+    server.fail_next(2, status=500)
+    try:
+        for _ in range(2):
+            with pytest.raises(LLMUnavailableError):
+                client.chat(MESSAGES)
+        assert breaker.state == "open"
+
+        served = server.requests_served
+        with pytest.raises(CircuitOpenError):
+            client.chat(MESSAGES)
+        assert server.requests_served == served  # short-circuited, upstream not called
+
+        time.sleep(0.25)
+        assert breaker.state == "half_open"
+        assert client.chat(MESSAGES)
+        assert breaker.state == "closed"
+    finally:
+        client.close()
+    assert client.stats["short_circuits"] == 1
+
+
+def test_failed_half_open_probe_reopens(server):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+    client = make_client(server, max_retries=0, breaker=breaker)
+    server.fail_next(2, status=500)
+    try:
+        with pytest.raises(LLMUnavailableError):
+            client.chat(MESSAGES)
+        time.sleep(0.25)
+        with pytest.raises(LLMUnavailableError):
+            client.chat(MESSAGES)  # the probe fails
+        assert breaker.state == "open"
+    finally:
+        client.close()
+
+
+def test_hedge_wins_over_a_stalled_request(server):
+    client = make_client(server, timeout=3.0, deadline=3.0, max_retries=0, hedge_after=0.1)
+    server.stall_next(1)
+    started = time.monotonic()
+    try:
+        assert client.chat(MESSAGES).startswith("This is a fake answer")
+    finally:
+        client.close()
+    assert time.monotonic() - started < server.stall_seconds
+    assert client.stats["hedges"] == 1
+    assert client.stats["hedge_wins"] == 1
+    assert server.requests_served == 2
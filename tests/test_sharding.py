@@ -0,0 +1,58 @@
+"""ShardedIndex routing and its full-search fallback, on hand-made unit vectors."""
+import numpy as np
+
+from sharding import ShardedIndex, Shard
+
+
+def unit(*components):
+    vector = np.array(components, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_index(**kwargs):
+    # Shard "a" is mostly e1 plus one outlier near e4, so its centroid says
+    # little about the outlier; "b" sits closer to the outlier than "a" does
+    outlier = unit(0, 0.3, 0, 1)
+    vectors = {
+        "a": [unit(1, 0, 0, 0)] * 5 + [outlier],
+        "b": [unit(0, 1, 0, 0)] * 3,
+        "c": [unit(0, 0, 1, 0)] * 3,
+    }
+    shards, start = {}, 0
+    for name, rows in vectors.items():
+        ids = np.arange(start, start + len(rows), dtype=np.int64)
+        shards[name] = Shard(name, np.stack(rows), ids)
+        start += len(rows)
+    return ShardedIndex(shards, max_shards=1, margin=0.0, **kwargs), outlier
+
+
+def test_routing_alone_misses_an_outlier():
+    index, outlier = make_index(fallback_margin=None)
+    assert index.route("", outlier) == ["b"]
+    _, ids = index.search("", outlier, 1)
+    assert ids[0][0] != 5
+    assert index.self_query_misses() == [5]
+
+
+def test_weak_routed_hit_falls_back_to_every_shard():
+    index, outlier = make_index()
+    distances, ids = index.search("", outlier, 1)
+    assert ids[0][0] == 5 and distances[0][0] < 1e-6
+    assert index.stats["fallbacks"] == 1
+    assert index.stats["vectors_scanned"] == index.total
+    assert index.self_query_misses() == []
+
+
+def test_strong_routed_hit_does_not_fall_back():
+    index, _ = make_index()
+    distances, ids = index.search("", unit(0, 0, 1, 0), 2)
+    assert set(ids[0]) <= {9, 10, 11}
+    assert index.stats["fallbacks"] == 0
+    assert index.stats["vectors_scanned"] == 3
+
+
+def test_explicit_shards_are_searched_as_given():
+    index, outlier = make_index()
+    _, ids = index.search("", outlier, 1, shard_names=["c"])
+    assert ids[0][0] in (9, 10, 11)
+    assert index.stats["fallbacks"] == 0